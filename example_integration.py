@@ -4,31 +4,327 @@ Example integration of OpenAI Usage Tracker with actual OpenAI API calls.
 This shows how to track token usage in your own applications.
 """
 
+import argparse
+import asyncio
+import atexit
+import hashlib
+import io
+import json
+import logging
+import logging.handlers
 import os
+import queue
+import re
+import sys
+import time
+from collections import OrderedDict
+import httpx
 import openai
+try:
+    import tiktoken
+except ImportError:  # optional: token counts fall back to estimate_tokens()
+    tiktoken = None
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib json module
+    orjson = None
+from openai.types.chat import ChatCompletion
 from openai_usage_monitor import OpenAIUsageTracker
 
+logger = logging.getLogger("openai_monitor")
+
 # Model pricing (as of 2024 - check OpenAI pricing page for current rates)
+# 'cached' is the rate for prompt tokens served from OpenAI's prompt cache;
+# models without prompt caching bill cached tokens at the full prompt rate.
 MODEL_PRICING = {
-    'gpt-4': {'prompt': 0.00003, 'completion': 0.00006},
-    'gpt-4-turbo': {'prompt': 0.00001, 'completion': 0.00003},
-    'gpt-3.5-turbo': {'prompt': 0.0000015, 'completion': 0.000002},
-    'gpt-4o': {'prompt': 0.000005, 'completion': 0.000015},
-    'gpt-4o-mini': {'prompt': 0.00000015, 'completion': 0.0000006},
+    'gpt-4': {'prompt': 0.00003, 'completion': 0.00006, 'cached': 0.00003},
+    'gpt-4-turbo': {'prompt': 0.00001, 'completion': 0.00003, 'cached': 0.00001},
+    'gpt-3.5-turbo': {'prompt': 0.0000015, 'completion': 0.000002, 'cached': 0.0000015},
+    'gpt-4o': {'prompt': 0.000005, 'completion': 0.000015, 'cached': 0.0000025},
+    'gpt-4o-mini': {'prompt': 0.00000015, 'completion': 0.0000006, 'cached': 0.000000075},
 }
 
-def calculate_cost(model, prompt_tokens, completion_tokens):
-    """Calculate cost based on model and token usage."""
-    if model not in MODEL_PRICING:
-        # Default to gpt-4 pricing if model not found
-        model = 'gpt-4'
+# Batch API requests are billed at half the synchronous rate
+BATCH_DISCOUNT = 0.5
+
+# Flattened (prompt, completion, cached) rates so calculate_cost does a single lookup.
+# Keys are interned so lookups with interned model names match by identity.
+_PRICING = {sys.intern(m): (v['prompt'], v['completion'], v['cached']) for m, v in MODEL_PRICING.items()}
+# Default to gpt-4 pricing if model not found
+_DEFAULT = _PRICING['gpt-4']
+
+def calculate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0, _get=_PRICING.get, _D=_DEFAULT):
+    """Calculate cost based on model and token usage.
+    
+    cached_tokens is the part of prompt_tokens that hit the prompt cache.
+    _get and _D bind the pricing lookup as locals; callers should not pass them.
+    """
+    p, c, k = _get(model, _D)
+    return (prompt_tokens - cached_tokens) * p + cached_tokens * k + completion_tokens * c
+
+def get_cached_tokens(usage):
+    """Get the number of prompt tokens served from OpenAI's prompt cache."""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return (getattr(details, 'cached_tokens', None) or 0) if details else 0
+
+# Cheaper models route_model may pick for short gpt-4 family prompts
+ROUTE_CANDIDATES = ('gpt-4o-mini', 'gpt-4o')
+# Prompts estimated below this many tokens are considered "short"
+ROUTE_TOKEN_THRESHOLD = 200
+
+def estimate_tokens(messages):
+    """Roughly estimate prompt tokens (about 4 characters per token)."""
+    return sum(len(m.get('content') or '') // 4 for m in messages)
+
+def _combined_rate(model):
+    """Prompt + completion rate, used to rank models by price."""
+    p, c, _ = _PRICING.get(model, _DEFAULT)
+    return p + c
+
+def route_model(messages, preferred):
+    """Pick the cheapest candidate model for short prompts sent to a gpt-4 family model."""
+    if not preferred.startswith('gpt-4') or estimate_tokens(messages) >= ROUTE_TOKEN_THRESHOLD:
+        return preferred
+    
+    cheapest = min(ROUTE_CANDIDATES, key=_combined_rate)
+    return cheapest if _combined_rate(cheapest) < _combined_rate(preferred) else preferred
+
+# Context window sizes (tokens) used by the pre-flight budget check
+MODEL_CONTEXT = {
+    'gpt-4': 8192,
+    'gpt-4-turbo': 128000,
+    'gpt-3.5-turbo': 16385,
+    'gpt-4o': 128000,
+    'gpt-4o-mini': 128000,
+}
+# Approximate per-message formatting overhead in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_ENC_CACHE = {}
+
+def _count_text_tokens(text, model):
+    """Count the tokens in text with tiktoken (cached per model)."""
+    enc = _ENC_CACHE.get(model)
+    if enc is None:
+        try:
+            enc = tiktoken.encoding_for_model(model)
+        except KeyError:
+            enc = tiktoken.get_encoding("o200k_base")
+        _ENC_CACHE[model] = enc
+    return len(enc.encode(text))
+
+def count_message_tokens(messages, model):
+    """Count the prompt tokens of each message, estimating if tiktoken is not installed."""
+    if tiktoken is None:
+        return [len(m.get('content') or '') // 4 + MESSAGE_OVERHEAD_TOKENS for m in messages]
+    return [_count_text_tokens(m.get('content') or '', model) + MESSAGE_OVERHEAD_TOKENS
+            for m in messages]
+
+def check_context_budget(messages, model, max_tokens=0, truncate=False):
+    """
+    Make sure a request fits the model's context window before sending it.
+    
+    With truncate=True the oldest non-system messages are dropped until it
+    fits (the last message is always kept); otherwise ValueError is raised.
+    """
+    limit = MODEL_CONTEXT.get(model)
+    if limit is None:
+        return messages
+    
+    counts = count_message_tokens(messages, model)
+    total = sum(counts) + max_tokens
+    if total <= limit:
+        return messages
+    if not truncate:
+        raise ValueError(f"Request needs ~{total:,} tokens but {model} allows {limit:,}")
+    
+    messages = list(messages)
+    i = 0
+    while total > limit and i < len(messages) - 1:
+        if messages[i].get('role') == 'system':
+            i += 1
+            continue
+        total -= counts.pop(i)
+        del messages[i]
+    if total > limit:
+        raise ValueError(f"Request needs ~{total:,} tokens but {model} allows {limit:,}")
+    return messages
+
+# compact_payload only rewrites content where decimals make up at least this
+# share of the whitespace-separated words (and there are at least this many)
+COMPACT_MIN_DENSITY = 0.3
+COMPACT_MIN_NUMBERS = 20
+# Decimal places kept for numbers in compacted content
+COMPACT_DECIMALS = 3
+
+_DECIMAL_RE = re.compile(r"-?\d+\.\d+")
+_CELL_PADDING_RE = re.compile(r" *([,;|]) *")
+
+def _round_decimal(match):
+    """Round one decimal literal to COMPACT_DECIMALS places, dropping trailing zeros."""
+    text = f"{float(match.group()):.{COMPACT_DECIMALS}f}".rstrip('0').rstrip('.')
+    return '0' if text in ('-0', '') else text
+
+def compact_content(content):
+    """Shorten number-dense text (tables, CSV dumps) to use fewer prompt tokens.
+    
+    Long decimals are rounded to COMPACT_DECIMALS places and padding around
+    delimiters is removed. Prose is returned unchanged.
+    """
+    if not isinstance(content, str):
+        return content
+    numbers = len(_DECIMAL_RE.findall(content))
+    if numbers < COMPACT_MIN_NUMBERS or numbers < COMPACT_MIN_DENSITY * len(content.split()):
+        return content
+    
+    content = _DECIMAL_RE.sub(_round_decimal, content)
+    return _CELL_PADDING_RE.sub(r"\1", content)
+
+def compact_payload(messages):
+    """Return a copy of messages with number-dense content compacted."""
+    return [dict(m, content=compact_content(m.get('content'))) for m in messages]
+
+def dumps_json(obj, sort_keys=False):
+    """Serialize obj to compact UTF-8 JSON bytes, using orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return json.dumps(obj, sort_keys=sort_keys, separators=(',', ':'), ensure_ascii=False).encode()
+
+def loads_json(data):
+    """Parse JSON text or bytes, using orjson when installed."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+# Retries for rate limits (429), connection errors and 5xx responses; the SDK
+# backs off exponentially between attempts and honours Retry-After headers
+MAX_RETRIES = 5
+
+# Shared client so every call reuses pooled keep-alive connections
+_HTTP_CLIENT = None
+_CLIENT = None
+
+def get_client(api_key=None):
+    """Get the shared OpenAI client, creating it on first use."""
+    global _HTTP_CLIENT, _CLIENT
+    if _CLIENT is None:
+        _HTTP_CLIENT = httpx.Client(
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+        )
+        _CLIENT = openai.OpenAI(api_key=api_key, http_client=_HTTP_CLIENT, max_retries=MAX_RETRIES)
+        atexit.register(_HTTP_CLIENT.close)
+    return _CLIENT
+
+# In-process LRU layer in front of the tracker's response_cache table
+RESPONSE_CACHE_SIZE = 256
+_RESPONSE_CACHE = OrderedDict()
+# Bump whenever response_cache_key changes; entries under other versions are
+# deleted from each tracker database on first lookup
+RESPONSE_CACHE_VERSION = 2
+_RESPONSE_CACHE_PREFIX = f"v{RESPONSE_CACHE_VERSION}:"
+_PRUNED_CACHE_DBS = set()
+
+def response_cache_key(model, messages, kwargs):
+    """Hash a request (model, messages, sorted kwargs) into a versioned cache key.
     
-    pricing = MODEL_PRICING[model]
-    prompt_cost = prompt_tokens * pricing['prompt']
-    completion_cost = completion_tokens * pricing['completion']
-    return prompt_cost + completion_cost
+    Returns None when kwargs hold values that are not JSON serializable
+    (e.g. a pydantic response_format or an httpx.Timeout); such calls are
+    not cached.
+    """
+    try:
+        payload = dumps_json({'model': model, 'messages': messages, 'kwargs': kwargs}, sort_keys=True)
+    except TypeError:  # also orjson.JSONEncodeError
+        return None
+    return _RESPONSE_CACHE_PREFIX + hashlib.sha256(payload).hexdigest()
+
+def _remember_response(cache_key, response):
+    """Add a response to the in-process cache, evicting the least recently used past RESPONSE_CACHE_SIZE."""
+    _RESPONSE_CACHE[cache_key] = response
+    _RESPONSE_CACHE.move_to_end(cache_key)
+    while len(_RESPONSE_CACHE) > RESPONSE_CACHE_SIZE:
+        _RESPONSE_CACHE.popitem(last=False)
 
-def make_tracked_openai_call(tracker, session_id, messages, model='gpt-4', **kwargs):
+def get_cached_response(tracker, cache_key):
+    """Look up a cached response in memory first, then in the tracker database."""
+    if tracker.db_path not in _PRUNED_CACHE_DBS:
+        _PRUNED_CACHE_DBS.add(tracker.db_path)
+        tracker.clear_response_cache(keep_prefix=_RESPONSE_CACHE_PREFIX)
+    response = _RESPONSE_CACHE.get(cache_key)
+    if response is None:
+        response_json = tracker.get_cached_response(cache_key)
+        if response_json is not None:
+            response = ChatCompletion.model_validate_json(response_json)
+            _remember_response(cache_key, response)
+    else:
+        _RESPONSE_CACHE.move_to_end(cache_key)
+    return response
+
+def _prepare_call(tracker, messages, model, use_cache, cached_prefix, route, compact, truncate, kwargs):
+    """Route the model, compact, prefix and budget-check the messages, and look up the response cache.
+    
+    Returns (model, messages, cache_key, cached_response).
+    """
+    model = sys.intern(model)
+    
+    if route:
+        routed = route_model(messages, model)
+        if routed != model:
+            logger.info("🔀 Routed %s -> %s (short prompt)", model, routed)
+            model = routed
+    
+    if compact:
+        messages = compact_payload(messages)
+    
+    if cached_prefix:
+        messages = [{"role": "system", "content": cached_prefix}] + list(messages)
+    
+    messages = check_context_budget(messages, model, kwargs.get('max_tokens') or 0, truncate)
+    
+    cache_key = None
+    cached = None
+    if use_cache:
+        cache_key = response_cache_key(model, messages, kwargs)
+        if cache_key is None:
+            logger.debug("Request arguments are not JSON serializable; skipping the response cache")
+        else:
+            cached = get_cached_response(tracker, cache_key)
+            if cached is not None:
+                logger.info("♻️  Cache hit: reused stored response, 0 tokens billed")
+    return model, messages, cache_key, cached
+
+def _log_usage(tracker, session_id, model, prompt_tokens, completion_tokens, cached_tokens=0,
+               defer_log=False):
+    """Cost and log one API call's usage. Returns the cost."""
+    # Calculate cost
+    cost = calculate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+    
+    # Log the usage (deferred calls are written by tracker.flush())
+    log = tracker.log_api_call_deferred if defer_log else tracker.log_api_call
+    log(
+        session_id=session_id,
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cost=cost,
+        cached_tokens=cached_tokens
+    )
+    
+    logger.info("✅ API call logged: %d tokens (%d cached), $%.4f",
+                prompt_tokens + completion_tokens, cached_tokens, cost)
+    return cost
+
+def _track_response(tracker, session_id, model, response, cache_key, defer_log=False):
+    """Log the usage of a completed API call and store it in the response cache."""
+    usage = response.usage
+    _log_usage(tracker, session_id, model, usage.prompt_tokens, usage.completion_tokens,
+               get_cached_tokens(usage), defer_log)
+    
+    if cache_key is not None:
+        _remember_response(cache_key, response)
+        tracker.cache_response(cache_key, response.model_dump_json())
+
+def make_tracked_openai_call(tracker, session_id, messages, model='gpt-4', use_cache=False,
+                             cached_prefix=None, route=False, compact=False, truncate=False,
+                             defer_log=False, **kwargs):
     """
     Make an OpenAI API call and automatically track the usage.
     
@@ -37,62 +333,311 @@ def make_tracked_openai_call(tracker, session_id, messages, model='gpt-4', **kwa
         session_id: Current session ID
         messages: Messages for the API call
         model: Model to use
+        use_cache: Return a stored response for an identical earlier request
+            instead of calling the API again (no tokens are billed or logged)
+        cached_prefix: Shared instructions sent as an identical leading system
+            message on every call, so OpenAI can bill them at the cached rate
+        route: Let route_model swap in a cheaper model for short prompts
+        compact: Shrink number-dense message content with compact_payload
+        truncate: Drop the oldest messages if the request would overflow the
+            context window (otherwise ValueError is raised before sending)
+        defer_log: Queue the usage with tracker.log_api_call_deferred; the
+            caller must call tracker.flush() to write it
         **kwargs: Additional arguments for OpenAI API
     
     Returns:
         OpenAI API response
+    
+    Rate limits and connection errors are retried by the client (MAX_RETRIES);
+    any other API error propagates unchanged.
     """
+    model, messages, cache_key, cached = _prepare_call(tracker, messages, model, use_cache,
+                                                       cached_prefix, route, compact, truncate, kwargs)
+    if cached is not None:
+        # Log the hit at no cost so the call still shows up in the usage counts
+        _log_usage(tracker, session_id, model, 0, 0, defer_log=defer_log)
+        return cached
+
     try:
         # Make the API call
-        response = openai.ChatCompletion.create(
+        response = get_client().chat.completions.create(
             model=model,
             messages=messages,
             **kwargs
         )
         
-        # Extract token usage
-        usage = response['usage']
-        prompt_tokens = usage['prompt_tokens']
-        completion_tokens = usage['completion_tokens']
+        _track_response(tracker, session_id, model, response, cache_key, defer_log=defer_log)
         
-        # Calculate cost
-        cost = calculate_cost(model, prompt_tokens, completion_tokens)
+        return response
         
-        # Log the usage
-        tracker.log_api_call(
-            session_id=session_id,
+    except openai.RateLimitError as e:
+        logger.error("❌ Rate limited after %d retries: %s", MAX_RETRIES, e)
+        raise
+    except openai.APIConnectionError as e:
+        logger.error("❌ Connection failed after %d retries: %s", MAX_RETRIES, e)
+        raise
+
+# Sentence-ending punctuation followed by whitespace; punctuation at the very
+# end of the text so far may still be part of a number such as "3.14"
+_SENTENCE_END_RE = re.compile(r"[.!?]\s")
+
+def make_tracked_streaming_call(tracker, session_id, messages, model='gpt-4', min_chars=40,
+                                defer_log=False, **kwargs):
+    """
+    Stream a completion and stop reading once a complete sentence has arrived.
+    
+    Args:
+        tracker: OpenAIUsageTracker instance
+        session_id: Current session ID
+        messages: Messages for the API call
+        model: Model to use
+        min_chars: Stop at the first sentence end after this many characters;
+            None reads the whole response
+        defer_log: Queue the usage with tracker.log_api_call_deferred
+        **kwargs: Additional arguments for OpenAI API
+    
+    Returns:
+        The generated text
+    """
+    stream = get_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        **kwargs
+    )
+    
+    parts = []
+    length = 0
+    last_char = ''
+    usage = None
+    try:
+        for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                length += len(delta)
+                # Prepend the previous delta's last character so a boundary
+                # split across two deltas is still found
+                if (min_chars is not None and length >= min_chars
+                        and _SENTENCE_END_RE.search(last_char + delta)):
+                    break
+                last_char = delta[-1]
+    finally:
+        # Closing the response tells the server to stop generating
+        stream.close()
+    
+    text = ''.join(parts)
+    if usage is not None:
+        _log_usage(tracker, session_id, model, usage.prompt_tokens, usage.completion_tokens,
+                   get_cached_tokens(usage), defer_log)
+    else:
+        # The usage chunk comes last, so a stream stopped early has to be counted locally
+        prompt_tokens = sum(count_message_tokens(messages, model))
+        completion_tokens = (_count_text_tokens(text, model) if tiktoken is not None
+                             else max(1, len(text) // 4))
+        _log_usage(tracker, session_id, model, prompt_tokens, completion_tokens, defer_log=defer_log)
+    return text
+
+async def make_tracked_openai_call_async(client, tracker, session_id, messages, model='gpt-4',
+                                         use_cache=False, cached_prefix=None, route=False,
+                                         compact=False, truncate=False, defer_log=False, **kwargs):
+    """
+    Async version of make_tracked_openai_call using an openai.AsyncOpenAI client.
+    
+    Tracking runs on the event loop thread after the response arrives, so
+    concurrent calls never write to the tracker database at the same time.
+    """
+    model, messages, cache_key, cached = _prepare_call(tracker, messages, model, use_cache,
+                                                       cached_prefix, route, compact, truncate, kwargs)
+    if cached is not None:
+        # Log the hit at no cost so the call still shows up in the usage counts
+        _log_usage(tracker, session_id, model, 0, 0, defer_log=defer_log)
+        return cached
+
+    try:
+        response = await client.chat.completions.create(
             model=model,
-            prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens,
-            cost=cost
+            messages=messages,
+            **kwargs
         )
         
-        print(f"✅ API call logged: {prompt_tokens + completion_tokens} tokens, ${cost:.4f}")
+        _track_response(tracker, session_id, model, response, cache_key, defer_log=defer_log)
         
         return response
         
-    except Exception as e:
-        print(f"❌ Error making API call: {e}")
+    except openai.RateLimitError as e:
+        logger.error("❌ Rate limited after %d retries: %s", MAX_RETRIES, e)
+        raise
+    except openai.APIConnectionError as e:
+        logger.error("❌ Connection failed after %d retries: %s", MAX_RETRIES, e)
         raise
 
+async def make_tracked_calls_concurrently(tracker, session_id, conversations, api_key=None, **kwargs):
+    """
+    Run all conversations concurrently and track their usage.
+    
+    Usage rows are queued while the calls are in flight and written in a
+    single transaction once they have all finished.
+    
+    Returns:
+        List of responses in conversation order; a failed call is returned
+        as its exception instead of cancelling the others
+    """
+    client = openai.AsyncOpenAI(api_key=api_key, max_retries=MAX_RETRIES)
+    try:
+        return await asyncio.gather(
+            *(make_tracked_openai_call_async(client, tracker, session_id, conv["messages"],
+                                             model=conv["model"], defer_log=True, **kwargs)
+              for conv in conversations),
+            return_exceptions=True
+        )
+    finally:
+        tracker.flush()
+        await client.close()
+
+def make_tracked_batch(tracker, session_id, conversations, poll_interval=10, **kwargs):
+    """
+    Submit several conversations as one OpenAI Batch API job and track the usage.
+    
+    Args:
+        tracker: OpenAIUsageTracker instance
+        session_id: Current session ID
+        conversations: List of {"messages": [...], "model": "..."} dicts
+        poll_interval: Seconds between batch status checks
+        **kwargs: Additional arguments for every request body
+    
+    Returns:
+        Dict mapping each conversation's index (starting at 1) to its
+        ChatCompletion, or None if that request failed
+    """
+    # Build the JSONL input file in memory, one request per line
+    buffer = io.BytesIO()
+    models = {}
+    for i, conv in enumerate(conversations, 1):
+        custom_id = f"call-{i}"
+        models[custom_id] = conv["model"]
+        request = {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": conv["model"], "messages": conv["messages"], **kwargs}
+        }
+        buffer.write(dumps_json(request) + b"\n")
+    
+    client = get_client()
+    batch_file = client.files.create(file=("batch.jsonl", buffer.getvalue()), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.info("📦 Submitted batch %s with %d requests", batch.id, len(conversations))
+    
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch.id)
+    
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} ended with status '{batch.status}'")
+    
+    results = {}
+    if batch.output_file_id:
+        output = client.files.content(batch.output_file_id).content
+        for line in output.splitlines():
+            result = loads_json(line)
+            custom_id = result["custom_id"]
+            index = int(custom_id.split("-", 1)[1])
+            body = (result.get("response") or {}).get("body")
+            if not body or "usage" not in body:
+                results[index] = None
+                continue
+            
+            # Validate once into the SDK's typed model and use attribute access from here on
+            response = ChatCompletion.model_validate(body)
+            model = models[custom_id]
+            usage = response.usage
+            prompt_tokens = usage.prompt_tokens
+            completion_tokens = usage.completion_tokens
+            cached_tokens = get_cached_tokens(usage)
+            cost = calculate_cost(model, prompt_tokens, completion_tokens, cached_tokens) * BATCH_DISCOUNT
+            
+            tracker.log_api_call_deferred(
+                session_id=session_id,
+                model=model,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                cost=cost,
+                cached_tokens=cached_tokens,
+                cost_multiplier=BATCH_DISCOUNT
+            )
+            logger.info("✅ Batch call logged: %d tokens, $%.4f", prompt_tokens + completion_tokens, cost)
+            results[index] = response
+        
+        tracker.flush()
+    
+    # Requests missing from the output file failed (see batch.error_file_id)
+    for i in range(1, len(conversations) + 1):
+        results.setdefault(i, None)
+    
+    return results
+
+def setup_logging():
+    """Send log records through a queue so console I/O runs on a listener thread.
+    
+    Returns the started QueueListener; stop it to flush pending output.
+    """
+    log_queue = queue.Queue(-1)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+    return listener
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Example of tracked OpenAI API calls')
+    parser.add_argument('--batch', action='store_true',
+                        help='Submit all conversations as one Batch API job (cheaper, not interactive)')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='Send all conversations at once with the async client')
+    parser.add_argument('--recost', action='store_true',
+                        help='Recompute stored costs with the current MODEL_PRICING and exit')
+    return parser.parse_args()
+
 def main():
     """Example usage of the tracked OpenAI calls."""
+    args = parse_args()
     
     # Get API key
     api_key = os.getenv('OPENAI_API_KEY')
     if not api_key:
-        print("❌ Please set OPENAI_API_KEY environment variable")
+        logger.error("❌ Please set OPENAI_API_KEY environment variable")
         return
     
-    # Set up OpenAI
-    openai.api_key = api_key
+    # Set up the shared OpenAI client
+    get_client(api_key)
     
     # Initialize tracker
     tracker = OpenAIUsageTracker(api_key)
     
+    if args.recost:
+        # Each call's cached tokens and batch discount are stored with it and kept
+        updated = tracker.recalculate_costs(_PRICING, _DEFAULT)
+        logger.info("✅ Recalculated cost for %d logged calls", updated)
+        return
+    
     # Create a new session
     session_id = tracker.create_session("example_session")
-    print(f"📊 Created session: {session_id}")
+    logger.info("📊 Created session: %s", session_id)
     
     # Example conversations
     conversations = [
@@ -116,38 +661,86 @@ def main():
         }
     ]
     
-    print("\n🚀 Making tracked API calls...")
-    
-    for i, conv in enumerate(conversations, 1):
-        print(f"\n📞 Call {i}: {conv['model']}")
+    if args.batch:
+        logger.info("\n🚀 Submitting tracked batch job...")
         try:
-            response = make_tracked_openai_call(
+            results = make_tracked_batch(
                 tracker=tracker,
                 session_id=session_id,
-                messages=conv["messages"],
-                model=conv["model"],
+                conversations=conversations,
                 max_tokens=150,
                 temperature=0.7
             )
-            
-            # Print the response
-            content = response['choices'][0]['message']['content']
-            print(f"🤖 Response: {content[:100]}...")
-            
+            for i, response in sorted(results.items()):
+                if response is None:
+                    logger.error("❌ Call %d failed", i)
+                    continue
+                content = response.choices[0].message.content
+                logger.info("🤖 Response %d: %.100s...", i, content)
         except Exception as e:
-            print(f"❌ Failed: {e}")
+            logger.error("❌ Batch failed: %s", e)
+    elif args.concurrent:
+        logger.info("\n🚀 Making concurrent tracked API calls...")
+        responses = asyncio.run(make_tracked_calls_concurrently(
+            tracker=tracker,
+            session_id=session_id,
+            conversations=conversations,
+            api_key=api_key,
+            use_cache=True,
+            max_tokens=150,
+            temperature=0.7
+        ))
+        for i, response in enumerate(responses, 1):
+            if isinstance(response, Exception):
+                logger.error("❌ Call %d failed: %s", i, response)
+                continue
+            content = response.choices[0].message.content
+            logger.info("🤖 Response %d: %.100s...", i, content)
+    else:
+        logger.info("\n🚀 Making tracked API calls...")
+        
+        try:
+            for i, conv in enumerate(conversations, 1):
+                logger.info("\n📞 Call %d: %s", i, conv['model'])
+                try:
+                    response = make_tracked_openai_call(
+                        tracker=tracker,
+                        session_id=session_id,
+                        messages=conv["messages"],
+                        model=conv["model"],
+                        use_cache=True,
+                        defer_log=True,
+                        max_tokens=150,
+                        temperature=0.7
+                    )
+                    
+                    # Print the response
+                    content = response.choices[0].message.content
+                    logger.info("🤖 Response: %.100s...", content)
+                    
+                except Exception as e:
+                    logger.error("❌ Failed: %s", e)
+        finally:
+            # Write all logged calls in one transaction
+            tracker.flush()
     
     # Show session summary
     data = tracker.get_local_usage_data()
     if data['active_session']:
         session = data['active_session']
-        print(f"\n📊 Session Summary:")
-        print(f"   Total Tokens: {session[4]:,}")
-        print(f"   Total Cost: ${session[7]:.4f}")
-        print(f"   API Calls: {len(data['recent_calls'])}")
+        logger.info("\n📊 Session Summary:")
+        logger.info("   Total Tokens: %s", format(session.total_tokens, ","))
+        logger.info("   Total Cost: $%.4f", session.total_cost)
+        logger.info("   Cost at current pricing: $%.4f",
+                    tracker.aggregate_costs(_PRICING, _DEFAULT, session_id))
+        logger.info("   API Calls: %d", data['recent_call_count'])
     
-    print(f"\n✅ Example complete! Run the monitor to see real-time tracking:")
-    print(f"   ./openai_usage_monitor.py")
+    logger.info("\n✅ Example complete! Run the monitor to see real-time tracking:")
+    logger.info("   ./openai_usage_monitor.py")
 
 if __name__ == "__main__":
-    main()
+    listener = setup_logging()
+    try:
+        main()
+    finally:
+        listener.stop()
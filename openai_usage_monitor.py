@@ -1,33 +1,158 @@
 #!/usr/bin/env python3
 
+import asyncio
+import atexit
+from bisect import bisect_right
 import json
+import logging
 import sys
 import time
 from datetime import datetime, timedelta, timezone
 import os
+import signal
+import threading
 import argparse
 import pytz
 import requests
+from urllib3.util.retry import Retry
 from typing import Dict, List, Optional, Tuple
 import sqlite3
 from pathlib import Path
 import hashlib
+import secrets
+import io
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib json module
+    orjson = None
+
+# Errors from background threads, where printing would corrupt the display
+logger = logging.getLogger("openai_monitor")
+
+
+@dataclass
+class Session:
+    """Totals for a usage session, as returned by get_local_usage_data()."""
+    __slots__ = ('session_id', 'key_id', 'start_time', 'total_tokens', 'prompt_tokens',
+                 'completion_tokens', 'total_cost', 'model')
+
+    session_id: str
+    key_id: Optional[str]
+    start_time: str
+    total_tokens: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_cost: float
+    model: Optional[str]
+
+
+# One row of get_local_usage_data()['recent_calls']; still indexable like the plain tuples
+ApiCall = namedtuple('ApiCall', 'id session_id key_id timestamp model prompt_tokens '
+                                'completion_tokens total_tokens cost')
 
 
 class OpenAIUsageTracker:
     """Track OpenAI API usage and store in local database."""
 
-    def __init__(self, api_key: str = None, db_path: str = "openai_usage.db", key_id: str = None):
+    # Seconds a cached get_usage_analytics() result stays valid
+    ANALYTICS_CACHE_TTL = 60
+    # Seconds an unchanged get_local_usage_data() result is reused before the
+    # last-hour window is re-queried anyway
+    LOCAL_DATA_MAX_AGE = 60
+    # Queued API calls are written as soon as this many are waiting
+    FLUSH_THRESHOLD = 100
+    # Batch writes between explicit WAL checkpoints, which keep the -wal file
+    # from growing during long sessions
+    CHECKPOINT_EVERY = 1000
+    # Stored in PRAGMA user_version once init_database() has run; bump it
+    # whenever init_database() creates or migrates something new
+    SCHEMA_VERSION = 7
+
+    def __init__(self, api_key: str = None, db_path: str = "openai_usage.db", key_id: str = None,
+                 flush_interval: float = None):
         self.api_key = api_key
         self.db_path = db_path
         self.base_url = "https://api.openai.com/v1"
         self.key_id = key_id
+        # When set, log_api_call() queues calls and a background thread writes
+        # them every flush_interval seconds
+        self.flush_interval = flush_interval
+        # Pooled HTTP session so repeated usage polls reuse the TLS connection
+        self._http = requests.Session()
+        # Keep up to 20 connections to the API host for callers polling from several
+        # threads, and retry rate-limited or failed requests with backoff
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+                        raise_on_status=False)
+        self._http.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=20,
+                                                                   max_retries=retries))
+        self._http.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+        self._pending = []  # API calls queued by log_api_call_deferred
+        self._writes_since_checkpoint = 0
+        # (days, key_id) -> (latest call id, time cached, analytics dict)
+        self._analytics_cache = {}
+        # (database version, time fetched, usage data) from the last get_local_usage_data()
+        self._local_data = None
+        # active_only -> (database version, key dicts) from the last list_keys()
+        self._keys_cache = {}
+        self._conn = self._connect()
+        # Serializes write transactions on the shared connection across threads
+        self._lock = threading.RLock()
         self.init_database()
+        # Executor for alog_api_call() writes; its single thread starts on first use
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        self._flush_stop = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="usage-flush", daemon=True)
+            self._flusher.start()
+        # Refresh planner statistics and release the connection on exit
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the long-lived connection shared by all tracker methods."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # WAL lets the monitor read while another process is writing
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-65536")
+        return conn
+
+    def close(self):
+        """Write queued calls, then close the database connection and HTTP session."""
+        atexit.unregister(self.close)
+        self._writer.shutdown(wait=True)
+        if self._flusher is not None:
+            self._flush_stop.set()
+            self._flusher.join()
+        self.flush()
+        # Let SQLite re-analyze any tables whose statistics have drifted
+        self._conn.execute("PRAGMA optimize")
+        self._conn.close()
+        self._http.close()
     
     def init_database(self):
         """Initialize SQLite database for storing usage data."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
+
+        # A database already set up at this schema version needs none of this
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] >= self.SCHEMA_VERSION:
+            return
+
+        # Create and migrate everything in a single transaction
+        cursor.execute("BEGIN")
 
         # New table for API keys/users
         cursor.execute('''
@@ -56,6 +181,8 @@ class OpenAIUsageTracker:
                 model TEXT,
                 is_active BOOLEAN DEFAULT 1,
                 created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                start_time_unix INTEGER,
+                end_time_unix INTEGER,
                 FOREIGN KEY (key_id) REFERENCES api_keys (key_id)
             )
         ''')
@@ -72,6 +199,10 @@ class OpenAIUsageTracker:
                 total_tokens INTEGER,
                 cost REAL,
                 created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                timestamp_unix INTEGER,
+                timestamp_ms INTEGER,
+                cached_tokens INTEGER,
+                cost_multiplier REAL,
                 FOREIGN KEY (session_id) REFERENCES usage_sessions (session_id),
                 FOREIGN KEY (key_id) REFERENCES api_keys (key_id)
             )
@@ -95,6 +226,19 @@ class OpenAIUsageTracker:
             )
         ''')
 
+        # Per-model daily totals, for model breakdowns without scanning api_calls
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_usage_models (
+                date TEXT,
+                key_id TEXT,
+                model TEXT,
+                total_tokens INTEGER DEFAULT 0,
+                total_cost REAL DEFAULT 0.0,
+                call_count INTEGER DEFAULT 0,
+                FOREIGN KEY (key_id) REFERENCES api_keys (key_id)
+            )
+        ''')
+
         # New table for usage alerts and notifications
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS usage_alerts (
@@ -125,11 +269,65 @@ class OpenAIUsageTracker:
             )
         ''')
 
+        # Per-database settings, such as the API key hashing pepper
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tracker_config (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+
+        # New table for cached API responses (content-addressed by request hash)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                hash TEXT PRIMARY KEY,
+                response TEXT,
+                ts REAL
+            )
+        ''')
+
         # Migration: Add key_id column to existing tables if not exists
         self._migrate_schema(cursor)
 
-        conn.commit()
-        conn.close()
+        # Indexes for the time-window, per-key and active-session lookups
+        cursor.execute("DROP INDEX IF EXISTS idx_calls_key_ts")  # replaced by idx_calls_key_unix
+        cursor.execute("DROP INDEX IF EXISTS idx_calls_ts")  # range filters use the epoch column
+        # total_tokens rides along so the last-hour token SUM is answered from the index
+        cursor.execute("DROP INDEX IF EXISTS idx_calls_unix")  # replaced by idx_calls_unix_tokens
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_calls_unix_tokens ON api_calls(timestamp_unix, total_tokens)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_calls_key_unix ON api_calls(key_id, timestamp_unix)")
+        cursor.execute("DROP INDEX IF EXISTS idx_calls_session_ts")  # replaced by idx_calls_session_cover
+        # Covers the active session's totals and latest-model lookup in
+        # get_local_usage_data, so neither reads the table
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_calls_session_cover
+            ON api_calls(session_id, timestamp, model, total_tokens, prompt_tokens, completion_tokens, cost)
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_calls_model_ts ON api_calls(model, timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_keys_active ON api_keys(created_at) WHERE is_active = 1")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_active ON usage_sessions(is_active, start_time DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_start_unix ON usage_sessions(start_time_unix)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_daily_date ON daily_usage(date DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_daily_key_date ON daily_usage(key_id, date)")
+        # NULL key_ids compare equal here, making this the upsert target for model totals
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_models_day
+            ON daily_usage_models(date, IFNULL(key_id, ''), IFNULL(model, ''))
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_daily_models_key_date ON daily_usage_models(key_id, date)")
+        # Covers the monitor's recent-alerts query so it never touches the table
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alerts_active_time
+            ON usage_alerts(is_active, triggered_at, alert_type, message)
+        ''')
+
+        # Gather planner statistics once; later runs keep them as they are
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if not cursor.fetchone():
+            cursor.execute("ANALYZE")
+
+        cursor.execute(f"PRAGMA user_version = {int(self.SCHEMA_VERSION)}")
+        self._conn.commit()
 
     def _migrate_schema(self, cursor):
         """Migrate existing database schema to support multi-key tracking."""
@@ -183,13 +381,102 @@ class OpenAIUsageTracker:
             except sqlite3.OperationalError:
                 pass  # Column already exists
 
+        # Unix epoch copies of the ISO timestamps, used for range filtering
+        cursor.execute("PRAGMA table_info(api_calls)")
+        columns = [col[1] for col in cursor.fetchall()]
+
+        if 'timestamp_unix' not in columns:
+            cursor.execute("ALTER TABLE api_calls ADD COLUMN timestamp_unix INTEGER")
+            # Stored timestamps are local time; 'utc' converts them before taking the epoch
+            cursor.execute('''
+                UPDATE api_calls SET timestamp_unix = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+            ''')
+
+        # Millisecond epoch for the burn rate, which needs sub-second call spacing
+        if 'timestamp_ms' not in columns:
+            cursor.execute("ALTER TABLE api_calls ADD COLUMN timestamp_ms INTEGER")
+            cursor.execute('''
+                UPDATE api_calls
+                SET timestamp_ms = CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)
+            ''')
+
+        # How each call was priced, so recalculate_costs() keeps cached-token and
+        # batch discounts; older calls stay NULL because their pricing is unknown
+        if 'cost_multiplier' not in columns:
+            cursor.execute("ALTER TABLE api_calls ADD COLUMN cached_tokens INTEGER")
+            cursor.execute("ALTER TABLE api_calls ADD COLUMN cost_multiplier REAL")
+
+        cursor.execute("PRAGMA table_info(usage_sessions)")
+        columns = [col[1] for col in cursor.fetchall()]
+
+        if 'start_time_unix' not in columns:
+            cursor.execute("ALTER TABLE usage_sessions ADD COLUMN start_time_unix INTEGER")
+            cursor.execute("ALTER TABLE usage_sessions ADD COLUMN end_time_unix INTEGER")
+            cursor.execute('''
+                UPDATE usage_sessions
+                SET start_time_unix = CAST(strftime('%s', start_time, 'utc') AS INTEGER),
+                    end_time_unix = CAST(strftime('%s', end_time, 'utc') AS INTEGER)
+            ''')
+
+        # UNIQUE(date, key_id) lets rows with a NULL key_id repeat, so add a unique
+        # index that treats NULL as one key (the update_daily_usage upsert target)
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_daily_date_key'")
+        if not cursor.fetchone():
+            cursor.execute('''
+                DELETE FROM daily_usage WHERE id NOT IN (
+                    SELECT MAX(id) FROM daily_usage GROUP BY date, IFNULL(key_id, '')
+                )
+            ''')
+            cursor.execute("CREATE UNIQUE INDEX idx_daily_date_key ON daily_usage(date, IFNULL(key_id, ''))")
+
+        # Fill per-model daily totals from the calls logged before the table existed
+        cursor.execute("SELECT 1 FROM daily_usage_models LIMIT 1")
+        if not cursor.fetchone():
+            cursor.execute('''
+                INSERT INTO daily_usage_models (date, key_id, model, total_tokens, total_cost, call_count)
+                SELECT substr(timestamp, 1, 10), key_id, model, SUM(total_tokens), SUM(cost), COUNT(*)
+                FROM api_calls
+                GROUP BY substr(timestamp, 1, 10), key_id, model
+            ''')
+
+        # Each alert fires at most once per day, enforced by the index so
+        # check_and_create_alerts can insert without looking first
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_alerts_type_day'")
+        if not cursor.fetchone():
+            cursor.execute('''
+                DELETE FROM usage_alerts WHERE id NOT IN (
+                    SELECT MIN(id) FROM usage_alerts
+                    GROUP BY alert_type, IFNULL(key_id, ''), DATE(triggered_at)
+                )
+            ''')
+            cursor.execute('''
+                CREATE UNIQUE INDEX idx_alerts_type_day
+                ON usage_alerts(alert_type, IFNULL(key_id, ''), DATE(triggered_at))
+            ''')
+
     # ============================================================================
     # KEY MANAGEMENT METHODS
     # ============================================================================
 
+    def _get_pepper(self) -> bytes:
+        """Get the secret key for API key hashing, creating one for this database if needed."""
+        env_pepper = os.getenv('OPENAI_MONITOR_PEPPER')
+        if env_pepper:
+            # Any length of secret works; blake2b keys are limited to 64 bytes
+            return hashlib.blake2b(env_pepper.encode(), digest_size=32).digest()
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO tracker_config (key, value) VALUES ('api_key_pepper', ?)",
+                (secrets.token_hex(16),))
+            row = self._conn.execute(
+                "SELECT value FROM tracker_config WHERE key = 'api_key_pepper'").fetchone()
+        return bytes.fromhex(row[0])
+
     def _hash_api_key(self, api_key: str) -> str:
         """Hash API key for secure storage."""
-        return hashlib.sha256(api_key.encode()).hexdigest()
+        # Keyed BLAKE2b, so stored hashes can't be matched against precomputed tables
+        return hashlib.blake2b(api_key.encode(), key=self._get_pepper(), digest_size=32).hexdigest()
 
     def _mask_api_key(self, api_key: str) -> str:
         """Mask API key for display (show only last 4 characters)."""
@@ -199,52 +486,57 @@ class OpenAIUsageTracker:
 
     def add_key(self, api_key: str, key_name: str, key_description: str = "") -> str:
         """Add a new API key to the database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
 
         # Generate unique key_id
         key_id = f"key_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         api_key_hash = self._hash_api_key(api_key)
 
         try:
-            cursor.execute('''
-                INSERT INTO api_keys (key_id, key_name, key_description, api_key_hash, is_active)
-                VALUES (?, ?, ?, ?, 1)
-            ''', (key_id, key_name, key_description, api_key_hash))
-
-            conn.commit()
-            conn.close()
+            with self._lock, self._conn:
+                cursor.execute('''
+                    INSERT INTO api_keys (key_id, key_name, key_description, api_key_hash, is_active)
+                    VALUES (?, ?, ?, ?, 1)
+                ''', (key_id, key_name, key_description, api_key_hash))
             return key_id
         except sqlite3.IntegrityError:
-            conn.close()
             raise ValueError(f"Key with name '{key_name}' already exists")
 
     def remove_key(self, key_id: str = None, key_name: str = None):
         """Remove an API key from the database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
 
-        if key_id:
-            cursor.execute("DELETE FROM api_keys WHERE key_id = ?", (key_id,))
-        elif key_name:
-            cursor.execute("DELETE FROM api_keys WHERE key_name = ?", (key_name,))
-        else:
-            conn.close()
-            raise ValueError("Either key_id or key_name must be provided")
+            if key_id:
+                cursor.execute("DELETE FROM api_keys WHERE key_id = ?", (key_id,))
+            elif key_name:
+                cursor.execute("DELETE FROM api_keys WHERE key_name = ?", (key_name,))
+            else:
+                raise ValueError("Either key_id or key_name must be provided")
 
-        conn.commit()
-        conn.close()
+    def list_keys(self, active_only: bool = False) -> List[Dict]:
+        """List all API keys in the database, or only the active ones."""
+        # The key list rarely changes; reuse it until anything is written
+        version = self.data_version()
+        cached = self._keys_cache.get(active_only)
+        if cached and cached[0] == version:
+            return cached[1]
 
-    def list_keys(self) -> List[Dict]:
-        """List all API keys in the database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
 
-        cursor.execute('''
-            SELECT key_id, key_name, key_description, is_active, created_at
-            FROM api_keys
-            ORDER BY created_at DESC
-        ''')
+        if active_only:
+            cursor.execute('''
+                SELECT key_id, key_name, key_description, is_active, created_at
+                FROM api_keys
+                WHERE is_active = 1
+                ORDER BY created_at DESC
+            ''')
+        else:
+            cursor.execute('''
+                SELECT key_id, key_name, key_description, is_active, created_at
+                FROM api_keys
+                ORDER BY created_at DESC
+            ''')
 
         keys = []
         for row in cursor.fetchall():
@@ -256,57 +548,35 @@ class OpenAIUsageTracker:
                 'created_at': row[4]
             })
 
-        conn.close()
+        self._keys_cache[active_only] = (version, keys)
         return keys
 
     def get_key(self, key_id: str = None, key_name: str = None) -> Optional[Dict]:
         """Get a specific API key by ID or name."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
         if key_id:
-            cursor.execute('''
-                SELECT key_id, key_name, key_description, is_active, created_at
-                FROM api_keys WHERE key_id = ?
-            ''', (key_id,))
+            field, value = 'key_id', key_id
         elif key_name:
-            cursor.execute('''
-                SELECT key_id, key_name, key_description, is_active, created_at
-                FROM api_keys WHERE key_name = ?
-            ''', (key_name,))
+            field, value = 'key_name', key_name
         else:
-            conn.close()
             return None
 
-        row = cursor.fetchone()
-        conn.close()
-
-        if row:
-            return {
-                'key_id': row[0],
-                'key_name': row[1],
-                'key_description': row[2],
-                'is_active': bool(row[3]),
-                'created_at': row[4]
-            }
+        for key in self.list_keys():
+            if key[field] == value:
+                return key
         return None
 
     def update_key_status(self, key_id: str, is_active: bool):
         """Enable or disable an API key."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
 
-        cursor.execute('''
-            UPDATE api_keys SET is_active = ? WHERE key_id = ?
-        ''', (1 if is_active else 0, key_id))
-
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                UPDATE api_keys SET is_active = ? WHERE key_id = ?
+            ''', (1 if is_active else 0, key_id))
 
     def get_key_usage_summary(self, key_id: str, days: int = 30) -> Dict:
         """Get usage summary for a specific key."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
 
         # Get total usage for the key
         cursor.execute('''
@@ -315,11 +585,10 @@ class OpenAIUsageTracker:
                 SUM(cost) as total_cost,
                 COUNT(*) as total_calls
             FROM api_calls
-            WHERE key_id = ? AND timestamp >= DATETIME('now', '-{} days')
-        '''.format(days), (key_id,))
+            WHERE key_id = ? AND timestamp_unix >= ?
+        ''', (key_id, int(time.time()) - int(days) * 86400))
 
         result = cursor.fetchone()
-        conn.close()
 
         return {
             'key_id': key_id,
@@ -333,30 +602,68 @@ class OpenAIUsageTracker:
     # END KEY MANAGEMENT METHODS
     # ============================================================================
 
+    # ============================================================================
+    # RESPONSE CACHE METHODS
+    # ============================================================================
+
+    def get_cached_response(self, cache_key: str) -> Optional[str]:
+        """Get a cached API response (JSON text) by its request hash."""
+        cursor = self._conn.cursor()
+
+        cursor.execute("SELECT response FROM response_cache WHERE hash = ?", (cache_key,))
+        row = cursor.fetchone()
+
+        return row[0] if row else None
+
+    def cache_response(self, cache_key: str, response_json: str):
+        """Store an API response (JSON text) under its request hash."""
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
+
+            cursor.execute('''
+                INSERT OR REPLACE INTO response_cache (hash, response, ts)
+                VALUES (?, ?, ?)
+            ''', (cache_key, response_json, time.time()))
+
+    def clear_response_cache(self, keep_prefix: str = None) -> int:
+        """Delete cached responses, keeping only keys that start with keep_prefix if given.
+
+        Returns the number of entries deleted.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
+
+            if keep_prefix is None:
+                cursor.execute("DELETE FROM response_cache")
+            else:
+                cursor.execute("DELETE FROM response_cache WHERE substr(hash, 1, ?) != ?",
+                               (len(keep_prefix), keep_prefix))
+            return cursor.rowcount
+
+    # ============================================================================
+    # END RESPONSE CACHE METHODS
+    # ============================================================================
+
     def get_current_usage(self) -> Optional[Dict]:
         """Get current usage from OpenAI API."""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
             # Get usage data for current month
             now = datetime.now()
             start_date = now.replace(day=1).strftime("%Y-%m-%d")
             end_date = now.strftime("%Y-%m-%d")
             
-            response = requests.get(
+            response = self._http.get(
                 f"{self.base_url}/usage",
-                headers=headers,
                 params={
                     "start_date": start_date,
                     "end_date": end_date
-                }
+                },
+                timeout=(3.05, 10)
             )
             
             if response.status_code == 200:
-                return response.json()
+                # orjson parses the raw body directly, skipping the text decode
+                return orjson.loads(response.content) if orjson is not None else response.json()
             else:
                 print(f"API Error: {response.status_code} - {response.text}")
                 return None
@@ -365,45 +672,70 @@ class OpenAIUsageTracker:
             print(f"Error fetching usage data: {e}")
             return None
     
+    def data_version(self) -> Tuple[int, int]:
+        """Get a marker that changes whenever any connection commits to the database."""
+        # data_version covers commits by other connections, total_changes our own
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, self._conn.total_changes
+
     def get_local_usage_data(self) -> Dict:
         """Get usage data from local database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Skip the queries while nothing has been written since the last call
+        version = self.data_version()
+        if (self._local_data and self._local_data[0] == version
+                and time.monotonic() - self._local_data[1] < self.LOCAL_DATA_MAX_AGE):
+            return self._local_data[2]
+
+        cursor = self._conn.cursor()
         
-        # Get active session
+        # Get active session, with its totals summed from its API calls
         cursor.execute('''
-            SELECT * FROM usage_sessions 
-            WHERE is_active = 1 
-            ORDER BY start_time DESC 
-            LIMIT 1
+            SELECT s.session_id, s.key_id, s.start_time,
+                   COALESCE(SUM(c.total_tokens), 0), COALESCE(SUM(c.prompt_tokens), 0),
+                   COALESCE(SUM(c.completion_tokens), 0), COALESCE(SUM(c.cost), 0.0),
+                   (SELECT model FROM api_calls
+                    WHERE session_id = s.session_id
+                    ORDER BY timestamp DESC LIMIT 1)
+            FROM (
+                SELECT session_id, key_id, start_time
+                FROM usage_sessions
+                WHERE is_active = 1 
+                ORDER BY start_time DESC 
+                LIMIT 1
+            ) s
+            LEFT JOIN api_calls c ON c.session_id = s.session_id
+            GROUP BY s.session_id
         ''')
-        active_session = cursor.fetchone()
+        row = cursor.fetchone()
+        active_session = Session(*row) if row else None
         
-        # Get recent sessions (last 24 hours)
-        yesterday = (datetime.now() - timedelta(days=1)).isoformat()
+        # Get API calls from the last hour
+        one_hour_ago = int(time.time()) - 3600
         cursor.execute('''
-            SELECT * FROM usage_sessions 
-            WHERE start_time >= ? 
-            ORDER BY start_time DESC
-        ''', (yesterday,))
-        recent_sessions = cursor.fetchall()
-        
-        # Get API calls for burn rate calculation
-        one_hour_ago = (datetime.now() - timedelta(hours=1)).isoformat()
+            SELECT id, session_id, key_id, timestamp, model, prompt_tokens, completion_tokens,
+                   total_tokens, cost
+            FROM api_calls
+            WHERE timestamp_unix >= ?
+            ORDER BY timestamp_unix DESC
+        ''', (one_hour_ago,))
+        recent_calls = list(map(ApiCall._make, cursor))
+
+        # Count and sum them in SQL for the dashboard and burn rate, covered
+        # by idx_calls_unix_tokens
         cursor.execute('''
-            SELECT * FROM api_calls 
-            WHERE timestamp >= ? 
-            ORDER BY timestamp DESC
+            SELECT COUNT(*), COALESCE(SUM(total_tokens), 0) FROM api_calls
+            WHERE timestamp_unix >= ?
         ''', (one_hour_ago,))
-        recent_calls = cursor.fetchall()
-        
-        conn.close()
+        recent_call_count, recent_tokens = cursor.fetchone()
         
-        return {
+        data = {
             'active_session': active_session,
-            'recent_sessions': recent_sessions,
-            'recent_calls': recent_calls
+            'recent_calls': recent_calls,
+            'recent_call_count': recent_call_count,
+            'recent_tokens': recent_tokens
         }
+        self._local_data = (version, time.monotonic(), data)
+        return data
     
     def create_session(self, session_id: str = None, key_id: str = None) -> str:
         """Create a new usage session."""
@@ -414,169 +746,405 @@ class OpenAIUsageTracker:
         if key_id is None:
             key_id = self.key_id
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        now = datetime.now()
+        now_iso, now_unix = now.isoformat(), int(now.timestamp())
 
-        # End any existing active sessions for this key
-        if key_id:
-            cursor.execute('''
-                UPDATE usage_sessions
-                SET is_active = 0, end_time = ?
-                WHERE is_active = 1 AND key_id = ?
-            ''', (datetime.now().isoformat(), key_id))
-        else:
-            cursor.execute('''
-                UPDATE usage_sessions
-                SET is_active = 0, end_time = ?
-                WHERE is_active = 1 AND key_id IS NULL
-            ''', (datetime.now().isoformat(),))
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
 
-        # Create new session
-        cursor.execute('''
-            INSERT OR REPLACE INTO usage_sessions
-            (session_id, key_id, start_time, is_active)
-            VALUES (?, ?, ?, 1)
-        ''', (session_id, key_id, datetime.now().isoformat()))
+            # End any existing active sessions for this key
+            if key_id:
+                cursor.execute('''
+                    UPDATE usage_sessions
+                    SET is_active = 0, end_time = ?, end_time_unix = ?
+                    WHERE is_active = 1 AND key_id = ?
+                ''', (now_iso, now_unix, key_id))
+            else:
+                cursor.execute('''
+                    UPDATE usage_sessions
+                    SET is_active = 0, end_time = ?, end_time_unix = ?
+                    WHERE is_active = 1 AND key_id IS NULL
+                ''', (now_iso, now_unix))
 
-        conn.commit()
-        conn.close()
+            # Create new session; reusing a session_id restarts that row in place
+            cursor.execute('''
+                INSERT INTO usage_sessions
+                (session_id, key_id, start_time, start_time_unix, is_active)
+                VALUES (?, ?, ?, ?, 1)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    key_id = excluded.key_id,
+                    start_time = excluded.start_time,
+                    start_time_unix = excluded.start_time_unix,
+                    is_active = 1,
+                    end_time = NULL,
+                    end_time_unix = NULL
+            ''', (session_id, key_id, now_iso, now_unix))
 
         return session_id
     
     def log_api_call(self, session_id: str, model: str, prompt_tokens: int,
-                     completion_tokens: int, cost: float = 0.0, key_id: str = None):
-        """Log an API call to the database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+                     completion_tokens: int, cost: float = 0.0, key_id: str = None,
+                     cached_tokens: int = 0, cost_multiplier: float = 1.0):
+        """Log an API call to the database.
+
+        cached_tokens is the part of prompt_tokens billed at the cached rate and
+        cost_multiplier any discount applied to the whole call (e.g. 0.5 for the
+        Batch API); both are kept so recalculate_costs() prices the call the same way.
+        """
+        if self.flush_interval:
+            self.log_api_call_deferred(session_id, model, prompt_tokens, completion_tokens, cost, key_id,
+                                       cached_tokens=cached_tokens, cost_multiplier=cost_multiplier)
+            return
 
+        row = self._call_row(session_id, model, prompt_tokens, completion_tokens, cost, key_id,
+                             cached_tokens=cached_tokens, cost_multiplier=cost_multiplier)
+        with self._lock, self._conn:
+            self._insert_calls(self._conn, [row])
+
+    async def alog_api_call(self, session_id: str, model: str, prompt_tokens: int,
+                            completion_tokens: int, cost: float = 0.0, key_id: str = None,
+                            cached_tokens: int = 0, cost_multiplier: float = 1.0):
+        """Log an API call from async code without blocking the event loop on the write."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer, self.log_api_call, session_id, model,
+                                   prompt_tokens, completion_tokens, cost, key_id,
+                                   cached_tokens, cost_multiplier)
+
+    def log_api_call_deferred(self, session_id: str, model: str, prompt_tokens: int,
+                              completion_tokens: int, cost: float = 0.0, key_id: str = None,
+                              timestamp: datetime = None, cached_tokens: int = 0,
+                              cost_multiplier: float = 1.0):
+        """Queue an API call to be written by the next flush().
+
+        The queue is flushed automatically once FLUSH_THRESHOLD calls are waiting.
+        """
+        row = self._call_row(session_id, model, prompt_tokens, completion_tokens, cost, key_id, timestamp,
+                             cached_tokens, cost_multiplier)
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.FLUSH_THRESHOLD:
+                self.flush()
+
+    def _call_row(self, session_id: str, model: str, prompt_tokens: int, completion_tokens: int,
+                  cost: float = 0.0, key_id: str = None, timestamp: datetime = None,
+                  cached_tokens: int = 0, cost_multiplier: float = 1.0) -> Tuple:
+        """Build the api_calls row that flush() inserts for one call."""
         # Use instance key_id if not provided
         if key_id is None:
             key_id = self.key_id
 
-        total_tokens = prompt_tokens + completion_tokens
+        now = timestamp or datetime.now()
+        return (session_id, key_id, now.isoformat(), model, prompt_tokens,
+                completion_tokens, prompt_tokens + completion_tokens, cost,
+                int(now.timestamp()), int(now.timestamp() * 1000), cached_tokens, cost_multiplier)
 
-        # Insert API call
-        cursor.execute('''
-            INSERT INTO api_calls
-            (session_id, key_id, timestamp, model, prompt_tokens, completion_tokens, total_tokens, cost)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (session_id, key_id, datetime.now().isoformat(), model, prompt_tokens,
-              completion_tokens, total_tokens, cost))
+    def flush(self) -> int:
+        """Write all queued API calls in a single transaction. Returns the number written."""
+        with self._lock:
+            return self._write_pending(self._conn)
 
-        # Update session totals
-        cursor.execute('''
-            UPDATE usage_sessions
-            SET total_tokens = total_tokens + ?,
-                prompt_tokens = prompt_tokens + ?,
-                completion_tokens = completion_tokens + ?,
-                total_cost = total_cost + ?,
-                model = ?
-            WHERE session_id = ?
-        ''', (total_tokens, prompt_tokens, completion_tokens, cost, model, session_id))
-
-        conn.commit()
-        conn.close()
+    def _write_pending(self, conn: sqlite3.Connection) -> int:
+        """Write all queued API calls through conn in a single transaction.
 
-    def update_daily_usage(self, key_id: str = None):
-        """Update daily usage summary."""
-        today = datetime.now().strftime("%Y-%m-%d")
+        Callers must hold self._lock, which guards the queue and checkpoint counter.
+        """
+        if not self._pending:
+            return 0
 
-        # Use instance key_id if not provided
-        if key_id is None:
-            key_id = self.key_id
+        rows, self._pending = self._pending, []
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        try:
+            with conn:
+                self._insert_calls(conn, rows)
+        except sqlite3.Error:
+            # Keep the calls queued so a later flush() can retry them
+            self._pending[:0] = rows
+            raise
+
+        self._writes_since_checkpoint += 1
+        if self._writes_since_checkpoint >= self.CHECKPOINT_EVERY:
+            self._writes_since_checkpoint = 0
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        return len(rows)
+
+    def _insert_calls(self, conn: sqlite3.Connection, rows: List[Tuple]):
+        """Insert _call_row() rows and add them to their days' daily_usage totals."""
+        # Session totals are summed from api_calls when read
+        conn.executemany('''
+            INSERT INTO api_calls
+            (session_id, key_id, timestamp, model, prompt_tokens, completion_tokens, total_tokens, cost,
+             timestamp_unix, timestamp_ms, cached_tokens, cost_multiplier)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+        # Keep the daily summary current between update_daily_usage() runs,
+        # which recompute it exactly (burn rates included)
+        totals = {}
+        for row in rows:
+            day_key = (row[2][:10], row[1], row[3])  # (date, key_id, model)
+            day_totals = totals.get(day_key)
+            if day_totals is None:
+                totals[day_key] = [row[6], row[7], 1]
+            else:
+                day_totals[0] += row[6]
+                day_totals[1] += row[7]
+                day_totals[2] += 1
+
+        conn.executemany('''
+            INSERT INTO daily_usage (date, key_id, total_tokens, total_cost, api_calls_count, models_used)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(date, IFNULL(key_id, '')) DO UPDATE SET
+                total_tokens = total_tokens + excluded.total_tokens,
+                total_cost = total_cost + excluded.total_cost,
+                api_calls_count = api_calls_count + excluded.api_calls_count,
+                models_used = CASE
+                    WHEN excluded.models_used IS NULL
+                         OR instr(',' || models_used || ',', ',' || excluded.models_used || ',') > 0
+                        THEN models_used
+                    WHEN models_used IS NULL OR models_used = '' THEN excluded.models_used
+                    ELSE models_used || ',' || excluded.models_used
+                END
+        ''', [(day, key_id, tokens, cost, count, model)
+              for (day, key_id, model), (tokens, cost, count) in totals.items()])
+
+        conn.executemany('''
+            INSERT INTO daily_usage_models (date, key_id, model, total_tokens, total_cost, call_count)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(date, IFNULL(key_id, ''), IFNULL(model, '')) DO UPDATE SET
+                total_tokens = total_tokens + excluded.total_tokens,
+                total_cost = total_cost + excluded.total_cost,
+                call_count = call_count + excluded.call_count
+        ''', [(day, key_id, model, tokens, cost, count)
+              for (day, key_id, model), (tokens, cost, count) in totals.items()])
+
+    def _flush_periodically(self):
+        """Background thread body: write queued calls every flush_interval seconds."""
+        # A connection of its own keeps these transactions apart from the caller's
+        conn = self._connect()
+        try:
+            while not self._flush_stop.wait(self.flush_interval):
+                try:
+                    with self._lock:
+                        self._write_pending(conn)
+                except sqlite3.Error as e:
+                    logger.error("Error writing queued API calls: %s", e)
+            with self._lock:
+                self._write_pending(conn)
+        finally:
+            conn.close()
 
-        # Get today's usage data for this key
-        if key_id:
+    def log_api_calls_batch(self, calls) -> int:
+        """Log several API calls, plus any already queued, in a single transaction.
+
+        Each call is a tuple of log_api_call_deferred() arguments:
+        (session_id, model, prompt_tokens, completion_tokens[, cost[, key_id[, timestamp
+        [, cached_tokens[, cost_multiplier]]]]]).
+        Returns the number of calls written.
+        """
+        rows = [self._call_row(*call) for call in calls]
+        with self._lock:
+            self._pending.extend(rows)
+            return self.flush()
+
+    def aggregate_costs(self, pricing: Dict[str, Tuple[float, ...]], default: Tuple[float, ...],
+                        session_id: str = None) -> float:
+        """Compute the cost of logged calls at the given per-model pricing.
+
+        Pricing maps a model to (prompt_rate, completion_rate[, cached_rate]),
+        as in recalculate_costs(); default prices models missing from it.
+        Token totals are summed per model and cost multiplier in SQL, so only
+        a handful of rows cross into Python regardless of how many calls
+        were logged.
+        """
+        cursor = self._conn.cursor()
+
+        if session_id:
             cursor.execute('''
-                SELECT
-                    SUM(total_tokens) as total_tokens,
-                    SUM(cost) as total_cost,
-                    COUNT(*) as api_calls_count,
-                    GROUP_CONCAT(DISTINCT model) as models_used
-                FROM api_calls
-                WHERE DATE(timestamp) = ? AND key_id = ?
-            ''', (today, key_id))
+                SELECT model, IFNULL(cost_multiplier, 1),
+                       SUM(prompt_tokens - IFNULL(cached_tokens, 0)), SUM(IFNULL(cached_tokens, 0)),
+                       SUM(completion_tokens)
+                FROM api_calls WHERE session_id = ?
+                GROUP BY model, IFNULL(cost_multiplier, 1)
+            ''', (session_id,))
         else:
             cursor.execute('''
-                SELECT
-                    SUM(total_tokens) as total_tokens,
-                    SUM(cost) as total_cost,
-                    COUNT(*) as api_calls_count,
-                    GROUP_CONCAT(DISTINCT model) as models_used
+                SELECT model, IFNULL(cost_multiplier, 1),
+                       SUM(prompt_tokens - IFNULL(cached_tokens, 0)), SUM(IFNULL(cached_tokens, 0)),
+                       SUM(completion_tokens)
                 FROM api_calls
-                WHERE DATE(timestamp) = ? AND key_id IS NULL
-            ''', (today,))
-
-        result = cursor.fetchone()
-        if result and result[0]:
-            total_tokens, total_cost, api_calls_count, models_used = result
+                GROUP BY model, IFNULL(cost_multiplier, 1)
+            ''')
 
-            # Calculate burn rates for today
-            if key_id:
-                cursor.execute('''
-                    SELECT total_tokens, timestamp FROM api_calls
-                    WHERE DATE(timestamp) = ? AND key_id = ?
-                    ORDER BY timestamp
-                ''', (today, key_id))
-            else:
+        total = 0.0
+        for model, multiplier, uncached_tokens, cached_tokens, completion_tokens in cursor.fetchall():
+            rates = pricing.get(model, default)
+            cached_rate = rates[2] if len(rates) > 2 else rates[0]
+            total += ((uncached_tokens or 0) * rates[0] + (cached_tokens or 0) * cached_rate
+                      + (completion_tokens or 0) * rates[1]) * multiplier
+
+        return total
+
+    def recalculate_costs(self, pricing: Dict[str, Tuple[float, ...]],
+                          default: Optional[Tuple[float, ...]] = None) -> int:
+        """Recompute the stored cost of every logged call after a price change.
+
+        Pricing maps a model to (prompt_rate, completion_rate[, cached_rate]);
+        without a cached rate, cached tokens cost the prompt rate. Each call
+        keeps its logged cached_tokens and cost_multiplier, and calls logged
+        before those were stored keep their original cost.
+
+        Calls to models missing from pricing are repriced at default, or
+        keep their stored cost when default is None.
+
+        Runs one set-based UPDATE per model (plus one for unknown models
+        when a default is given) and then refreshes the daily cost totals.
+        Returns the number of calls updated.
+        """
+        def rates(rate):
+            return (rate[0], rate[2] if len(rate) > 2 else rate[0], rate[1])
+
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
+
+            models = list(pricing)
+            cursor.executemany('''
+                UPDATE api_calls
+                SET cost = ((prompt_tokens - cached_tokens) * ? + cached_tokens * ? + completion_tokens * ?)
+                           * cost_multiplier
+                WHERE model = ? AND cost_multiplier IS NOT NULL
+            ''', [(*rates(pricing[m]), m) for m in models])
+            updated = cursor.rowcount if cursor.rowcount > 0 else 0
+
+            if default is not None:
+                placeholders = ','.join('?' * len(models))
                 cursor.execute('''
-                    SELECT total_tokens, timestamp FROM api_calls
-                    WHERE DATE(timestamp) = ? AND key_id IS NULL
-                    ORDER BY timestamp
-                ''', (today,))
+                    UPDATE api_calls
+                    SET cost = ((prompt_tokens - cached_tokens) * ? + cached_tokens * ? + completion_tokens * ?)
+                               * cost_multiplier
+                    WHERE (model IS NULL OR model NOT IN ({})) AND cost_multiplier IS NOT NULL
+                '''.format(placeholders), (*rates(default), *models))
+                updated += cursor.rowcount
 
-            calls = cursor.fetchall()
-            burn_rates = []
-
-            if len(calls) > 1:
-                for i in range(1, len(calls)):
-                    prev_time = datetime.fromisoformat(calls[i-1][1])
-                    curr_time = datetime.fromisoformat(calls[i][1])
-                    time_diff = (curr_time - prev_time).total_seconds() / 60  # minutes
+            cursor.execute('''
+                UPDATE daily_usage SET total_cost = (
+                    SELECT COALESCE(SUM(cost), 0) FROM api_calls
+                    WHERE api_calls.timestamp_unix >= CAST(strftime('%s', daily_usage.date, 'utc') AS INTEGER)
+                    AND api_calls.timestamp_unix < CAST(strftime('%s', daily_usage.date, '+1 day', 'utc') AS INTEGER)
+                    AND api_calls.key_id IS daily_usage.key_id
+                )
+            ''')
+            cursor.execute('''
+                UPDATE daily_usage_models SET total_cost = (
+                    SELECT COALESCE(SUM(cost), 0) FROM api_calls
+                    WHERE substr(api_calls.timestamp, 1, 10) = daily_usage_models.date
+                    AND api_calls.key_id IS daily_usage_models.key_id
+                    AND api_calls.model IS daily_usage_models.model
+                )
+            ''')
+        self._analytics_cache.clear()
+        return updated
 
-                    if time_diff > 0:
-                        tokens_diff = calls[i][0] - calls[i-1][0]
-                        burn_rate = tokens_diff / time_diff
-                        burn_rates.append(burn_rate)
+    def update_daily_usage(self, key_id: str = None):
+        """Update daily usage summary."""
+        now = datetime.now()
+        today = now.strftime("%Y-%m-%d")
+        # Today is the epoch range [local midnight, next local midnight)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_start = int(midnight.timestamp())
+        day_end = int((midnight + timedelta(days=1)).timestamp())
 
-            avg_burn_rate = sum(burn_rates) / len(burn_rates) if burn_rates else 0
-            peak_burn_rate = max(burn_rates) if burn_rates else 0
+        # Use instance key_id if not provided
+        if key_id is None:
+            key_id = self.key_id
 
-            # Insert or update daily summary
-            cursor.execute('''
-                INSERT OR REPLACE INTO daily_usage
+        key_id = key_id or None
+
+        # Aggregate today's calls (burn rate = tokens/min between consecutive calls)
+        # and upsert the summary row in a single statement; the window order
+        # matches idx_calls_key_unix (rowid breaks ties) so no sort is needed
+        with self._lock, self._conn:
+            self._conn.execute('''
+                WITH calls AS (
+                    SELECT
+                        total_tokens,
+                        cost,
+                        model,
+                        total_tokens - LAG(total_tokens) OVER (ORDER BY timestamp_unix, id) AS tokens_diff,
+                        (timestamp_ms - LAG(timestamp_ms) OVER (ORDER BY timestamp_unix, id))
+                            / 60000.0 AS minutes_diff
+                    FROM api_calls
+                    WHERE timestamp_unix >= ? AND timestamp_unix < ? AND key_id IS ?
+                )
+                INSERT INTO daily_usage
                 (date, key_id, total_tokens, total_cost, api_calls_count, models_used, avg_burn_rate, peak_burn_rate)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (today, key_id, total_tokens, total_cost, api_calls_count, models_used, avg_burn_rate, peak_burn_rate))
-
-        conn.commit()
-        conn.close()
+                SELECT * FROM (
+                    SELECT
+                        ?, ?,
+                        SUM(total_tokens) as total_tokens,
+                        SUM(cost),
+                        COUNT(*),
+                        GROUP_CONCAT(DISTINCT model),
+                        COALESCE(AVG(CASE WHEN minutes_diff > 0 THEN tokens_diff / minutes_diff END), 0),
+                        COALESCE(MAX(CASE WHEN minutes_diff > 0 THEN tokens_diff / minutes_diff END), 0)
+                    FROM calls
+                )
+                WHERE total_tokens > 0
+                ON CONFLICT(date, IFNULL(key_id, '')) DO UPDATE SET
+                    total_tokens = excluded.total_tokens,
+                    total_cost = excluded.total_cost,
+                    api_calls_count = excluded.api_calls_count,
+                    models_used = excluded.models_used,
+                    avg_burn_rate = excluded.avg_burn_rate,
+                    peak_burn_rate = excluded.peak_burn_rate
+            ''', (day_start, day_end, key_id, today, key_id))
+            self._conn.execute('''
+                INSERT INTO daily_usage_models (date, key_id, model, total_tokens, total_cost, call_count)
+                SELECT ?, ?, model, SUM(total_tokens), SUM(cost), COUNT(*)
+                FROM api_calls
+                WHERE timestamp_unix >= ? AND timestamp_unix < ? AND key_id IS ?
+                GROUP BY model
+                ON CONFLICT(date, IFNULL(key_id, ''), IFNULL(model, '')) DO UPDATE SET
+                    total_tokens = excluded.total_tokens,
+                    total_cost = excluded.total_cost,
+                    call_count = excluded.call_count
+            ''', (today, key_id, day_start, day_end, key_id))
+        self._analytics_cache.clear()
 
     def get_usage_analytics(self, days=7, key_id: str = None) -> Dict:
         """Get usage analytics for the last N days."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
 
         # Use instance key_id if not provided
         if key_id is None:
             key_id = self.key_id
 
+        # Reuse the last result while no new calls have been logged; the newest
+        # rowid is read straight off the table b-tree
+        cursor.execute("SELECT MAX(id) FROM api_calls")
+        latest_call = cursor.fetchone()[0]
+        cached = self._analytics_cache.get((days, key_id))
+        if (cached and cached[0] == latest_call
+                and time.monotonic() - cached[1] < self.ANALYTICS_CACHE_TTL):
+            return cached[2]
+
         # Get daily usage for last N days
         if key_id:
             cursor.execute('''
-                SELECT * FROM daily_usage
-                WHERE date >= DATE('now', '-{} days') AND key_id = ?
+                SELECT id, date, total_tokens, total_cost, api_calls_count, models_used,
+                       avg_burn_rate, peak_burn_rate
+                FROM daily_usage
+                WHERE date >= DATE('now', ?) AND key_id = ?
                 ORDER BY date DESC
-            '''.format(days), (key_id,))
+            ''', (f'-{int(days)} days', key_id))
         else:
             cursor.execute('''
-                SELECT * FROM daily_usage
-                WHERE date >= DATE('now', '-{} days') AND key_id IS NULL
+                SELECT id, date, total_tokens, total_cost, api_calls_count, models_used,
+                       avg_burn_rate, peak_burn_rate
+                FROM daily_usage
+                WHERE date >= DATE('now', ?) AND key_id IS NULL
                 ORDER BY date DESC
-            '''.format(days))
+            ''', (f'-{int(days)} days',))
 
         daily_data = cursor.fetchall()
 
@@ -586,86 +1154,208 @@ class OpenAIUsageTracker:
                 SELECT
                     model,
                     SUM(total_tokens) as total_tokens,
-                    SUM(cost) as total_cost,
-                    COUNT(*) as call_count
-                FROM api_calls
-                WHERE timestamp >= DATETIME('now', '-{} days') AND key_id = ?
+                    SUM(total_cost) as total_cost,
+                    SUM(call_count) as call_count
+                FROM daily_usage_models
+                WHERE date >= DATE('now', ?) AND key_id = ?
                 GROUP BY model
                 ORDER BY total_tokens DESC
-            '''.format(days), (key_id,))
+            ''', (f'-{int(days)} days', key_id))
         else:
             cursor.execute('''
                 SELECT
                     model,
                     SUM(total_tokens) as total_tokens,
-                    SUM(cost) as total_cost,
-                    COUNT(*) as call_count
-                FROM api_calls
-                WHERE timestamp >= DATETIME('now', '-{} days') AND key_id IS NULL
+                    SUM(total_cost) as total_cost,
+                    SUM(call_count) as call_count
+                FROM daily_usage_models
+                WHERE date >= DATE('now', ?) AND key_id IS NULL
                 GROUP BY model
                 ORDER BY total_tokens DESC
-            '''.format(days))
+            ''', (f'-{int(days)} days',))
 
         model_breakdown = cursor.fetchall()
 
+        # Period totals, so callers don't have to sum the rows above
+        if key_id:
+            cursor.execute('''
+                SELECT
+                    COALESCE(SUM(total_tokens), 0),
+                    COALESCE(SUM(total_cost), 0.0),
+                    COALESCE(SUM(api_calls_count), 0),
+                    (SELECT COALESCE(SUM(total_tokens), 0) FROM daily_usage_models
+                     WHERE date >= DATE('now', ?) AND key_id = ?)
+                FROM daily_usage
+                WHERE date >= DATE('now', ?) AND key_id = ?
+            ''', (f'-{int(days)} days', key_id, f'-{int(days)} days', key_id))
+        else:
+            cursor.execute('''
+                SELECT
+                    COALESCE(SUM(total_tokens), 0),
+                    COALESCE(SUM(total_cost), 0.0),
+                    COALESCE(SUM(api_calls_count), 0),
+                    (SELECT COALESCE(SUM(total_tokens), 0) FROM daily_usage_models
+                     WHERE date >= DATE('now', ?) AND key_id IS NULL)
+                FROM daily_usage
+                WHERE date >= DATE('now', ?) AND key_id IS NULL
+            ''', (f'-{int(days)} days', f'-{int(days)} days'))
+
+        *daily_totals, model_total_tokens = cursor.fetchone()
+
+        cutoff = int(time.time()) - int(days) * 86400
+
         # Get hourly usage pattern
         if key_id:
             cursor.execute('''
                 SELECT
-                    strftime('%H', timestamp) as hour,
+                    substr(timestamp, 12, 2) as hour,
                     AVG(total_tokens) as avg_tokens,
                     COUNT(*) as call_count
                 FROM api_calls
-                WHERE timestamp >= DATETIME('now', '-{} days') AND key_id = ?
-                GROUP BY strftime('%H', timestamp)
+                WHERE timestamp_unix >= ? AND key_id = ?
+                GROUP BY hour
                 ORDER BY hour
-            '''.format(days), (key_id,))
+            ''', (cutoff, key_id))
         else:
             cursor.execute('''
                 SELECT
-                    strftime('%H', timestamp) as hour,
+                    substr(timestamp, 12, 2) as hour,
                     AVG(total_tokens) as avg_tokens,
                     COUNT(*) as call_count
                 FROM api_calls
-                WHERE timestamp >= DATETIME('now', '-{} days') AND key_id IS NULL
-                GROUP BY strftime('%H', timestamp)
+                WHERE timestamp_unix >= ? AND key_id IS NULL
+                GROUP BY hour
                 ORDER BY hour
-            '''.format(days))
+            ''', (cutoff,))
 
         hourly_pattern = cursor.fetchall()
 
-        conn.close()
-
-        return {
+        analytics = {
             'daily_data': daily_data,
+            'daily_totals': tuple(daily_totals),  # (tokens, cost, calls)
             'model_breakdown': model_breakdown,
+            'model_total_tokens': model_total_tokens,
             'hourly_pattern': hourly_pattern,
             'period_days': days,
             'key_id': key_id
         }
+        self._analytics_cache[(days, key_id)] = (latest_call, time.monotonic(), analytics)
+        return analytics
 
     def get_all_keys_analytics(self, days=7) -> List[Dict]:
         """Get analytics for all keys."""
-        keys = self.list_keys()
-        all_analytics = []
+        keys = self.list_keys(active_only=True)
+        if not keys:
+            return []
 
-        for key in keys:
-            if key['is_active']:
-                analytics = self.get_usage_analytics(days=days, key_id=key['key_id'])
-                usage_summary = self.get_key_usage_summary(key['key_id'], days=days)
+        cursor = self._conn.cursor()
+        cutoff = int(time.time()) - int(days) * 86400
+
+        # One grouped query per analytics section covers every key; rows are
+        # then split per key in the same shape get_usage_analytics() returns
+        daily = {}
+        cursor.execute('''
+            SELECT key_id, id, date, total_tokens, total_cost, api_calls_count, models_used,
+                   avg_burn_rate, peak_burn_rate
+            FROM daily_usage
+            WHERE date >= DATE('now', ?) AND key_id IS NOT NULL
+            ORDER BY key_id, date DESC
+        ''', (f'-{int(days)} days',))
+        for row in cursor.fetchall():
+            daily.setdefault(row[0], []).append(row[1:])
+
+        cursor.execute('''
+            SELECT key_id, SUM(total_tokens), SUM(total_cost), SUM(api_calls_count)
+            FROM daily_usage
+            WHERE date >= DATE('now', ?) AND key_id IS NOT NULL
+            GROUP BY key_id
+        ''', (f'-{int(days)} days',))
+        daily_totals = {row[0]: row[1:] for row in cursor.fetchall()}
+
+        # Model breakdowns come from the same rollup --all-keys displays
+        models = {}
+        for key_id, rows in groupby(self.get_all_keys_rollup(days), key=itemgetter(0)):
+            models[key_id] = [row[2:] for row in rows if row[5] is not None]
+
+        hourly = {}
+        cursor.execute('''
+            SELECT
+                key_id,
+                substr(timestamp, 12, 2) as hour,
+                AVG(total_tokens) as avg_tokens,
+                COUNT(*) as call_count
+            FROM api_calls
+            WHERE timestamp_unix >= ? AND key_id IS NOT NULL
+            GROUP BY key_id, hour
+            ORDER BY key_id, hour
+        ''', (cutoff,))
+        for row in cursor.fetchall():
+            hourly.setdefault(row[0], []).append(row[1:])
 
-                all_analytics.append({
-                    'key_info': key,
-                    'analytics': analytics,
-                    'summary': usage_summary
-                })
+        all_analytics = []
+        for key in keys:
+            key_id = key['key_id']
+            model_breakdown = models.get(key_id, [])
+            tokens = sum(row[1] or 0 for row in model_breakdown)
+
+            all_analytics.append({
+                'key_info': key,
+                'analytics': {
+                    'daily_data': daily.get(key_id, []),
+                    'daily_totals': daily_totals.get(key_id, (0, 0.0, 0)),
+                    'model_breakdown': model_breakdown,
+                    'model_total_tokens': tokens,
+                    'hourly_pattern': hourly.get(key_id, []),
+                    'period_days': days,
+                    'key_id': key_id
+                },
+                # Key totals are the sum of its per-model totals
+                'summary': {
+                    'key_id': key_id,
+                    'total_tokens': tokens,
+                    'total_cost': sum((row[2] or 0.0 for row in model_breakdown), 0.0),
+                    'total_calls': sum(row[3] for row in model_breakdown),
+                    'days': days
+                }
+            })
 
         return all_analytics
 
+    def get_all_keys_rollup(self, days=7) -> List[Tuple]:
+        """Per-model totals for every active key in one query.
+
+        Rows are (key_id, key_name, model, total_tokens, total_cost, call_count),
+        grouped by key in list_keys() order. A key with no usage in the period
+        has a single row whose call_count is None.
+
+        The period is whole local calendar days, from the date `days` days
+        ago through today, since the totals come from daily_usage_models.
+        """
+        # daily_usage_models dates are local, so the cutoff is a local date too
+        since = (datetime.now() - timedelta(days=int(days))).strftime("%Y-%m-%d")
+
+        cursor = self._conn.cursor()
+        cursor.execute('''
+            SELECT
+                k.key_id,
+                k.key_name,
+                m.model,
+                SUM(m.total_tokens) as total_tokens,
+                SUM(m.total_cost) as total_cost,
+                SUM(m.call_count) as call_count
+            FROM api_keys k
+            LEFT JOIN daily_usage_models m
+                ON m.key_id = k.key_id AND m.date >= ?
+            WHERE k.is_active = 1
+            GROUP BY k.key_id, m.model
+            ORDER BY k.created_at DESC, k.key_id, total_tokens DESC
+        ''', (since,))
+        return cursor.fetchall()
+
     def compare_keys(self, days=30) -> Dict:
         """Compare usage across all keys."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
+        cutoff = int(time.time()) - int(days) * 86400
 
         # Get usage summary for each key
         cursor.execute('''
@@ -677,10 +1367,10 @@ class OpenAIUsageTracker:
                 COUNT(a.id) as total_calls
             FROM api_keys k
             LEFT JOIN api_calls a ON k.key_id = a.key_id
-            WHERE a.timestamp >= DATETIME('now', '-{} days')
+            WHERE a.timestamp_unix >= ?
             GROUP BY k.key_id, k.key_name
             ORDER BY total_tokens DESC
-        '''.format(days))
+        ''', (cutoff,))
 
         key_comparisons = []
         for row in cursor.fetchall():
@@ -699,11 +1389,10 @@ class OpenAIUsageTracker:
                 SUM(cost) as total_cost,
                 COUNT(*) as total_calls
             FROM api_calls
-            WHERE timestamp >= DATETIME('now', '-{} days')
-        '''.format(days))
+            WHERE timestamp_unix >= ?
+        ''', (cutoff,))
 
         total_row = cursor.fetchone()
-        conn.close()
 
         return {
             'key_comparisons': key_comparisons,
@@ -713,11 +1402,19 @@ class OpenAIUsageTracker:
             'period_days': days
         }
 
+    def get_recent_alerts(self, hours: int = 24, limit: int = 3) -> List[Tuple]:
+        """Get the newest active alerts as (alert_type, message, triggered_at) rows."""
+        # triggered_at holds UTC 'YYYY-MM-DD HH:MM:SS' text, so a bound cutoff in
+        # the same format is a plain range seek on idx_alerts_active_time
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
+        return self._conn.execute('''
+            SELECT alert_type, message, triggered_at FROM usage_alerts
+            WHERE is_active = 1 AND triggered_at >= ?
+            ORDER BY triggered_at DESC LIMIT ?
+        ''', (cutoff, limit)).fetchall()
+
     def check_and_create_alerts(self, current_usage: Dict):
         """Check usage against thresholds and create alerts."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
         # Define alert thresholds
         alerts_to_check = [
             ('token_usage_50', 0.5, 'Token usage exceeded 50%'),
@@ -735,6 +1432,7 @@ class OpenAIUsageTracker:
 
         usage_percentage = tokens_used / token_limit if token_limit > 0 else 0
 
+        triggered = []
         for alert_type, threshold, message in alerts_to_check:
             should_trigger = False
             current_value = 0
@@ -750,23 +1448,31 @@ class OpenAIUsageTracker:
                 current_value = burn_rate
 
             if should_trigger:
-                # Check if alert already exists for today
-                today = datetime.now().strftime("%Y-%m-%d")
-                cursor.execute('''
-                    SELECT id FROM usage_alerts
-                    WHERE alert_type = ? AND DATE(triggered_at) = ?
-                ''', (alert_type, today))
+                triggered.append((alert_type, threshold, current_value, message))
+
+        if not triggered:
+            return
 
-                if not cursor.fetchone():
-                    # Create new alert
-                    cursor.execute('''
-                        INSERT INTO usage_alerts
-                        (alert_type, threshold_value, current_value, message)
-                        VALUES (?, ?, ?, ?)
-                    ''', (alert_type, threshold, current_value, message))
+        # Alerts already raised today are dropped by the unique index
+        with self._lock, self._conn:
+            self._conn.executemany('''
+                INSERT OR IGNORE INTO usage_alerts
+                (alert_type, threshold_value, current_value, message)
+                VALUES (?, ?, ?, ?)
+            ''', triggered)
 
-        conn.commit()
-        conn.close()
+    def set_budget(self, budget_limit: float, token_limit: int,
+                   alert_thresholds: Tuple[float, ...] = (0.5, 0.75, 0.9), month_year: str = None):
+        """Set the budget for a month (the current one by default)."""
+        if month_year is None:
+            month_year = datetime.now().strftime("%Y-%m")
+
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO budget_settings
+                (month_year, budget_limit, token_limit, alert_thresholds)
+                VALUES (?, ?, ?, ?)
+            ''', (month_year, budget_limit, token_limit, json.dumps(list(alert_thresholds))))
 
 
 def format_time(minutes):
@@ -780,20 +1486,41 @@ def format_time(minutes):
     return f"{hours}h {mins}m"
 
 
+# ANSI color codes shared by the monitor, analytics and progress bars
+_CYAN = '\033[96m'
+_GREEN = '\033[92m'
+_BLUE = '\033[94m'
+_RED = '\033[91m'
+_YELLOW = '\033[93m'
+_WHITE = '\033[97m'
+_GRAY = '\033[90m'
+_RESET = '\033[0m'
+
+# Progress bars are 50 cells wide by default, so every default-width bar is built once
+_BAR_WIDTH = 50
+_GREEN_BARS = [f"{_GREEN}{'█' * i}{_RED}{'░' * (_BAR_WIDTH - i)}{_RESET}"
+               for i in range(_BAR_WIDTH + 1)]
+_BLUE_BARS = [f"{_BLUE}{'█' * i}{_RED}{'░' * (_BAR_WIDTH - i)}{_RESET}"
+              for i in range(_BAR_WIDTH + 1)]
+
+
+# Bars for the hourly pattern in display_analytics, indexed by filled length
+_HOURLY_BARS = tuple('█' * i + '░' * (15 - i) for i in range(16))
+
+
+def _bar(bars, fill_color, filled, width):
+    """Get a colored bar, from the precomputed list when width is the default."""
+    if width == _BAR_WIDTH and 0 <= filled <= width:
+        return bars[filled]
+    return f"{fill_color}{'█' * filled}{_RED}{'░' * (width - filled)}{_RESET}"
+
+
 def create_token_progress_bar(percentage, width=50):
     """Create a token usage progress bar with bracket style."""
     filled = int(width * percentage / 100)
     
-    # Create the bar with green fill and red empty space
-    green_bar = '█' * filled
-    red_bar = '░' * (width - filled)
-    
-    # Color codes
-    green = '\033[92m'  # Bright green
-    red = '\033[91m'    # Bright red
-    reset = '\033[0m'
-    
-    return f"🟢 [{green}{green_bar}{red}{red_bar}{reset}] {percentage:.1f}%"
+    # Green fill and red empty space
+    return f"🟢 [{_bar(_GREEN_BARS, _GREEN, filled, width)}] {percentage:.1f}%"
 
 
 def create_time_progress_bar(elapsed_minutes, total_minutes, width=50):
@@ -805,76 +1532,104 @@ def create_time_progress_bar(elapsed_minutes, total_minutes, width=50):
     
     filled = int(width * percentage / 100)
     
-    # Create the bar with blue fill and red empty space
-    blue_bar = '█' * filled
-    red_bar = '░' * (width - filled)
-    
-    # Color codes
-    blue = '\033[94m'   # Bright blue
-    red = '\033[91m'    # Bright red
-    reset = '\033[0m'
-    
+    # Blue fill and red empty space
     remaining_time = format_time(max(0, total_minutes - elapsed_minutes))
-    return f"⏰ [{blue}{blue_bar}{red}{red_bar}{reset}] {remaining_time}"
+    return f"⏰ [{_bar(_BLUE_BARS, _BLUE, filled, width)}] {remaining_time}"
+
+
+# Seconds between data refreshes while the database is unchanged; the
+# screen itself still redraws every few seconds
+DATA_REFRESH_SECONDS = 15
+
+# Terminal control sequences used to redraw the monitor in place
+_CURSOR_HOME = '\033[H'
+_CLEAR_EOL = '\033[K'
+_CLEAR_BELOW = '\033[J'
+_CLEAR_SCREEN = '\033[2J'
+_HIDE_CURSOR = '\033[?25l'
+_SHOW_CURSOR = '\033[?25h'
+
+# Sparkle pattern header, built once
+_SPARKLES = f"{_CYAN}✦ ✧ ✦ ✧ {_RESET}"
+_HEADER = (f"{_SPARKLES}{_CYAN}OPENAI TOKEN MONITOR{_RESET} {_SPARKLES}\n"
+           f"{_BLUE}{'=' * 60}{_RESET}\n")
+
+
+def _frame_update(old_lines, new_lines):
+    """Terminal output that turns the screen showing old_lines into new_lines."""
+    parts = []
+    for row, line in enumerate(new_lines, 1):
+        if row > len(old_lines) or old_lines[row - 1] != line:
+            parts.append(f"\033[{row};1H{line}{_CLEAR_EOL}")
+    if len(new_lines) < len(old_lines):
+        # The frame got shorter; wipe what is left of the old one
+        parts.append(f"\033[{len(new_lines) + 1};1H{_CLEAR_BELOW}")
+    # Leave the cursor on the last line, where the exit message expects it
+    parts.append(f"\033[{len(new_lines)};1H")
+    return ''.join(parts)
+
+
+def _interrupt(signum, frame):
+    """Turn SIGTERM into the same clean shutdown path as Ctrl+C."""
+    raise KeyboardInterrupt
 
 
 def print_header():
     """Print the stylized header with sparkles."""
-    cyan = '\033[96m'
-    blue = '\033[94m'
-    reset = '\033[0m'
-    
-    # Sparkle pattern
-    sparkles = f"{cyan}✦ ✧ ✦ ✧ {reset}"
-    
-    print(f"{sparkles}{cyan}OPENAI TOKEN MONITOR{reset} {sparkles}")
-    print(f"{blue}{'=' * 60}{reset}")
-    print()
+    print(_HEADER)
+
+
+# Burn rate thresholds (tokens/min) and the emoji for each band between them
+_VELOCITY_THRESHOLDS = (50, 150, 300)
+_VELOCITY_EMOJI = ('🐌', '➡️', '🚀', '⚡')  # Slow, normal, fast, very fast
 
 
 def get_velocity_indicator(burn_rate):
     """Get velocity emoji based on burn rate."""
-    if burn_rate < 50:
-        return '🐌'  # Slow
-    elif burn_rate < 150:
-        return '➡️'  # Normal
-    elif burn_rate < 300:
-        return '🚀'  # Fast
-    else:
-        return '⚡'  # Very fast
+    return _VELOCITY_EMOJI[bisect_right(_VELOCITY_THRESHOLDS, burn_rate)]
 
 
-def calculate_hourly_burn_rate(recent_calls, current_time):
-    """Calculate burn rate based on API calls in the last hour."""
-    if not recent_calls:
-        return 0
-    
-    total_tokens = sum(call[5] for call in recent_calls)  # total_tokens is index 5
-    return total_tokens / 60 if total_tokens > 0 else 0
+def calculate_hourly_burn_rate(recent_tokens, current_time):
+    """Calculate burn rate from the total tokens of API calls in the last hour."""
+    return recent_tokens / 60 if recent_tokens > 0 else 0.0
 
 
-def get_next_reset_time(current_time, custom_reset_hour=None, timezone_str='UTC'):
-    """Calculate next token reset time (monthly for OpenAI)."""
+@lru_cache(maxsize=64)
+def _parse_timestamp(value):
+    """Parse a stored ISO timestamp; the monitor sees the same few on every refresh."""
+    return datetime.fromisoformat(value)
+
+
+@lru_cache(maxsize=8)
+def _get_timezone(timezone_str):
+    """Resolve a timezone name once, falling back to UTC for unknown names."""
     try:
-        target_tz = pytz.timezone(timezone_str)
+        return pytz.timezone(timezone_str)
     except pytz.exceptions.UnknownTimeZoneError:
         print(f"Warning: Unknown timezone '{timezone_str}', using UTC")
-        target_tz = pytz.timezone('UTC')
+        return pytz.timezone('UTC')
+
+
+@lru_cache(maxsize=32)
+def _monthly_reset(year, month, timezone_str):
+    """First moment of the month after year/month in the given timezone."""
+    # divmod rolls December over into January of the next year
+    year_offset, month_index = divmod(month, 12)
+    return _get_timezone(timezone_str).localize(datetime(year + year_offset, month_index + 1, 1))
+
+
+def get_next_reset_time(current_time, custom_reset_hour=None, timezone_str='UTC'):
+    """Calculate next token reset time (monthly for OpenAI)."""
+    target_tz = _get_timezone(timezone_str)
 
     if current_time.tzinfo is not None:
         target_time = current_time.astimezone(target_tz)
     else:
         target_time = target_tz.localize(current_time)
 
-    # For OpenAI, reset is monthly (first day of next month)
-    if target_time.month == 12:
-        next_reset = target_tz.localize(
-            datetime(target_time.year + 1, 1, 1)
-        )
-    else:
-        next_reset = target_tz.localize(
-            datetime(target_time.year, target_time.month + 1, 1)
-        )
+    # For OpenAI, reset is monthly (first day of next month), so the
+    # answer only changes once a month
+    next_reset = _monthly_reset(target_time.year, target_time.month, timezone_str)
 
     if current_time.tzinfo is not None and current_time.tzinfo != target_tz:
         next_reset = next_reset.astimezone(current_time.tzinfo)
@@ -882,8 +1637,8 @@ def get_next_reset_time(current_time, custom_reset_hour=None, timezone_str='UTC'
     return next_reset
 
 
-def parse_args():
-    """Parse command line arguments."""
+def _build_parser():
+    """Build the command line parser."""
     parser = argparse.ArgumentParser(description='OpenAI Token Monitor - Real-time token usage monitoring')
     parser.add_argument('--api-key', type=str,
                         help='OpenAI API key (or set OPENAI_API_KEY environment variable)')
@@ -925,23 +1680,29 @@ def parse_args():
     parser.add_argument('--all-keys', action='store_true',
                         help='Show analytics for all keys')
 
-    return parser.parse_args()
+    return parser
+
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    return _build_parser().parse_args(argv)
+
+
+# OpenAI usage tiers (approximate monthly limits)
+_TIER_LIMITS = {
+    'tier1': 100000,      # $100/month
+    'tier2': 500000,      # $500/month
+    'tier3': 1000000,     # $1000/month
+    'tier4': 5000000,     # $5000/month
+    'tier5': 50000000,    # $50000/month
+}
 
 
 def get_token_limit(plan, custom_limit=None):
     """Get token limit based on plan type."""
     if plan == 'custom' and custom_limit:
         return custom_limit
-
-    # OpenAI usage tiers (approximate monthly limits)
-    limits = {
-        'tier1': 100000,      # $100/month
-        'tier2': 500000,      # $500/month
-        'tier3': 1000000,     # $1000/month
-        'tier4': 5000000,     # $5000/month
-        'tier5': 50000000,    # $50000/month
-    }
-    return limits.get(plan, 100000)
+    return _TIER_LIMITS.get(plan, 100000)
 
 
 def create_demo_session(tracker):
@@ -950,46 +1711,22 @@ def create_demo_session(tracker):
 
     # Simulate some API calls over the last hour
     now = datetime.now()
+    models = ['gpt-4', 'gpt-3.5-turbo', 'gpt-4-turbo']
+    calls = []
     for i in range(10):
         # Simulate calls at different times in the last hour
         call_time = now - timedelta(minutes=60-i*6)
 
         # Simulate different models and token usage
-        models = ['gpt-4', 'gpt-3.5-turbo', 'gpt-4-turbo']
         model = models[i % len(models)]
         prompt_tokens = 100 + (i * 50)
         completion_tokens = 50 + (i * 25)
         cost = (prompt_tokens * 0.00003) + (completion_tokens * 0.00006)
 
-        # Manually insert with specific timestamp
-        conn = sqlite3.connect(tracker.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO api_calls
-            (session_id, key_id, timestamp, model, prompt_tokens, completion_tokens, total_tokens, cost)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (session_id, tracker.key_id, call_time.isoformat(), model, prompt_tokens,
-              completion_tokens, prompt_tokens + completion_tokens, cost))
-        conn.commit()
-        conn.close()
-
-    # Update session totals
-    conn = sqlite3.connect(tracker.db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT SUM(total_tokens), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost)
-        FROM api_calls WHERE session_id = ?
-    ''', (session_id,))
-    totals = cursor.fetchone()
-
-    cursor.execute('''
-        UPDATE usage_sessions
-        SET total_tokens = ?, prompt_tokens = ?, completion_tokens = ?, total_cost = ?, model = 'gpt-4'
-        WHERE session_id = ?
-    ''', (*totals, session_id))
-
-    conn.commit()
-    conn.close()
+        calls.append((session_id, model, prompt_tokens, completion_tokens, cost, tracker.key_id, call_time))
+
+    # Insert the calls with their specific timestamps in one transaction
+    tracker.log_api_calls_batch(calls)
 
     return session_id
 
@@ -998,27 +1735,14 @@ def display_analytics(tracker, days=7):
     """Display usage analytics in a beautiful format."""
     analytics = tracker.get_usage_analytics(days)
 
-    # Color codes
-    cyan = '\033[96m'
-    green = '\033[92m'
-    blue = '\033[94m'
-    yellow = '\033[93m'
-    white = '\033[97m'
-    gray = '\033[90m'
-    reset = '\033[0m'
-
-    print(f"\n{cyan}📊 USAGE ANALYTICS - Last {days} Days{reset}")
-    print(f"{blue}{'=' * 60}{reset}\n")
+    print(f"\n{_CYAN}📊 USAGE ANALYTICS - Last {days} Days{_RESET}")
+    print(f"{_BLUE}{'=' * 60}{_RESET}\n")
 
     # Daily usage summary
     if analytics['daily_data']:
-        print(f"{white}📅 Daily Usage Summary:{reset}")
+        print(f"{_WHITE}📅 Daily Usage Summary:{_RESET}")
         print(f"{'Date':<12} {'Tokens':<10} {'Cost':<8} {'Calls':<6} {'Avg Rate':<10} {'Peak Rate':<10}")
-        print(f"{gray}{'-' * 70}{reset}")
-
-        total_tokens = 0
-        total_cost = 0.0
-        total_calls = 0
+        print(f"{_GRAY}{'-' * 70}{_RESET}")
 
         for day in analytics['daily_data']:
             date = day[1]
@@ -1028,23 +1752,20 @@ def display_analytics(tracker, days=7):
             avg_rate = day[6] or 0.0
             peak_rate = day[7] or 0.0
 
-            total_tokens += tokens
-            total_cost += cost
-            total_calls += calls
-
             print(f"{date:<12} {tokens:<10,} ${cost:<7.2f} {calls:<6} {avg_rate:<10.1f} {peak_rate:<10.1f}")
 
-        print(f"{gray}{'-' * 70}{reset}")
+        total_tokens, total_cost, total_calls = analytics['daily_totals']
+        print(f"{_GRAY}{'-' * 70}{_RESET}")
         print(f"{'TOTAL':<12} {total_tokens:<10,} ${total_cost:<7.2f} {total_calls:<6}")
         print()
 
     # Model breakdown
     if analytics['model_breakdown']:
-        print(f"{white}🤖 Model Usage Breakdown:{reset}")
+        print(f"{_WHITE}🤖 Model Usage Breakdown:{_RESET}")
         print(f"{'Model':<15} {'Tokens':<12} {'Cost':<10} {'Calls':<8} {'%':<6}")
-        print(f"{gray}{'-' * 55}{reset}")
+        print(f"{_GRAY}{'-' * 55}{_RESET}")
 
-        total_model_tokens = sum(model[1] for model in analytics['model_breakdown'])
+        total_model_tokens = analytics['model_total_tokens']
 
         for model in analytics['model_breakdown']:
             model_name = model[0]
@@ -1058,9 +1779,9 @@ def display_analytics(tracker, days=7):
 
     # Hourly usage pattern
     if analytics['hourly_pattern']:
-        print(f"{white}⏰ Hourly Usage Pattern:{reset}")
+        print(f"{_WHITE}⏰ Hourly Usage Pattern:{_RESET}")
         print(f"{'Hour':<6} {'Avg Tokens':<12} {'Calls':<8} {'Activity':<20}")
-        print(f"{gray}{'-' * 50}{reset}")
+        print(f"{_GRAY}{'-' * 50}{_RESET}")
 
         max_tokens = max(hour[1] for hour in analytics['hourly_pattern']) if analytics['hourly_pattern'] else 1
 
@@ -1071,16 +1792,17 @@ def display_analytics(tracker, days=7):
 
             # Create simple bar chart
             bar_length = int((avg_tokens / max_tokens) * 15) if max_tokens > 0 else 0
-            bar = '█' * bar_length + '░' * (15 - bar_length)
+            bar = _HOURLY_BARS[bar_length]
 
-            print(f"{hour_str:<6} {avg_tokens:<12.1f} {calls:<8} {green}{bar}{reset}")
+            print(f"{hour_str:<6} {avg_tokens:<12.1f} {calls:<8} {_GREEN}{bar}{_RESET}")
         print()
 
 
 def export_usage_data(tracker, format_type='csv', days=7):
     """Export usage data to CSV or JSON."""
     analytics = tracker.get_usage_analytics(days)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    now = datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
 
     if format_type == 'csv':
         import csv
@@ -1093,8 +1815,8 @@ def export_usage_data(tracker, format_type='csv', days=7):
             writer.writerow(['=== DAILY USAGE ==='])
             writer.writerow(['Date', 'Total Tokens', 'Total Cost', 'API Calls', 'Avg Burn Rate', 'Peak Burn Rate'])
 
-            for day in analytics['daily_data']:
-                writer.writerow([day[1], day[2], day[3], day[4], day[6], day[7]])
+            writer.writerows((day[1], day[2], day[3], day[4], day[6], day[7])
+                             for day in analytics['daily_data'])
 
             writer.writerow([])  # Empty row
 
@@ -1102,8 +1824,8 @@ def export_usage_data(tracker, format_type='csv', days=7):
             writer.writerow(['=== MODEL BREAKDOWN ==='])
             writer.writerow(['Model', 'Total Tokens', 'Total Cost', 'Call Count'])
 
-            for model in analytics['model_breakdown']:
-                writer.writerow([model[0], model[1], model[2], model[3]])
+            # Rows are already (model, tokens, cost, calls)
+            writer.writerows(analytics['model_breakdown'])
 
         print(f"✅ Data exported to {filename}")
 
@@ -1112,7 +1834,7 @@ def export_usage_data(tracker, format_type='csv', days=7):
         filename = f"openai_usage_{timestamp}.json"
 
         export_data = {
-            'export_timestamp': datetime.now().isoformat(),
+            'export_timestamp': now.isoformat(),
             'period_days': days,
             'daily_usage': [
                 {
@@ -1141,8 +1863,12 @@ def export_usage_data(tracker, format_type='csv', days=7):
             ]
         }
 
-        with open(filename, 'w') as jsonfile:
-            json.dump(export_data, jsonfile, indent=2)
+        if orjson is not None:
+            with open(filename, 'wb') as jsonfile:
+                jsonfile.write(orjson.dumps(export_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(filename, 'w') as jsonfile:
+                json.dump(export_data, jsonfile, indent=2)
 
         print(f"✅ Data exported to {filename}")
 
@@ -1238,31 +1964,31 @@ def main():
         return
 
     if args.all_keys:
-        all_analytics = tracker.get_all_keys_analytics(days=args.days)
+        rollup = tracker.get_all_keys_rollup(days=args.days)
 
-        if not all_analytics:
+        if not rollup:
             print("No active keys found")
             return
 
-        for key_analytics in all_analytics:
-            key_info = key_analytics['key_info']
-            summary = key_analytics['summary']
+        for _, rows in groupby(rollup, key=itemgetter(0)):
+            rows = list(rows)
+            # A key without usage has one row with no calls and no model breakdown
+            model_breakdown = [row for row in rows if row[5] is not None]
 
             print("\n" + "="*80)
-            print(f"📊 {key_info['key_name']} - Last {args.days} Days")
+            print(f"📊 {rows[0][1]} - Last {args.days} Days")
             print("="*80 + "\n")
 
-            print(f"🎯 Total Tokens: {summary['total_tokens']:,}")
-            print(f"💰 Total Cost:   ${summary['total_cost']:.2f}")
-            print(f"📞 Total Calls:  {summary['total_calls']}")
+            print(f"🎯 Total Tokens: {sum(row[3] or 0 for row in model_breakdown):,}")
+            print(f"💰 Total Cost:   ${sum(row[4] or 0.0 for row in model_breakdown):.2f}")
+            print(f"📞 Total Calls:  {sum(row[5] for row in model_breakdown)}")
             print()
 
             # Show model breakdown
-            analytics = key_analytics['analytics']
-            if analytics['model_breakdown']:
+            if model_breakdown:
                 print("🤖 Model Usage:")
-                for model_data in analytics['model_breakdown']:
-                    print(f"   {model_data[0]}: {model_data[1]:,} tokens, ${model_data[2]:.2f}")
+                for model_data in model_breakdown:
+                    print(f"   {model_data[2]}: {model_data[3]:,} tokens, ${model_data[4]:.2f}")
                 print()
 
         return
@@ -1284,17 +2010,7 @@ def main():
 
     # Handle budget setting
     if args.budget:
-        month_year = datetime.now().strftime("%Y-%m")
-        conn = sqlite3.connect(args.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO budget_settings
-            (month_year, budget_limit, token_limit, alert_thresholds)
-            VALUES (?, ?, ?, ?)
-        ''', (month_year, args.budget, get_token_limit(args.plan, args.limit),
-              json.dumps([0.5, 0.75, 0.9])))
-        conn.commit()
-        conn.close()
+        tracker.set_budget(args.budget, get_token_limit(args.plan, args.limit))
         print(f"✅ Monthly budget set to ${args.budget:.2f}")
         return
 
@@ -1307,60 +2023,68 @@ def main():
         create_demo_session(tracker)
         time.sleep(1)
 
-    try:
-        # Initial screen clear and hide cursor
-        os.system('clear' if os.name == 'posix' else 'cls')
-        print('\033[?25l', end='', flush=True)  # Hide cursor
-
-        while True:
-            # Move cursor to top without clearing
-            print('\033[H', end='', flush=True)
-
-            # Get usage data
-            data = tracker.get_local_usage_data()
-            active_session = data['active_session']
-            recent_calls = data['recent_calls']
-
-            if not active_session:
-                if not args.demo:
-                    print("No active session found. Creating new session...")
-                    tracker.create_session()
-                    continue
-                else:
-                    print("No active session found in demo mode")
-                    time.sleep(3)
-                    continue
-
-            # Extract data from active session
-            tokens_used = active_session[4]  # total_tokens
-            prompt_tokens = active_session[5]  # prompt_tokens
-            completion_tokens = active_session[6]  # completion_tokens
-            total_cost = active_session[7]  # total_cost
-            model = active_session[8] or "gpt-4"  # model
-
-            usage_percentage = (tokens_used / token_limit) * 100 if token_limit > 0 else 0
-            tokens_left = token_limit - tokens_used
-
-            # Time calculations
-            start_time_str = active_session[2]  # start_time
-            if start_time_str:
-                start_time = datetime.fromisoformat(start_time_str)
-                current_time = datetime.now()
-                # Make both timezone-aware or both naive
-                if start_time.tzinfo is not None:
-                    current_time = current_time.replace(tzinfo=timezone.utc)
-                elapsed = current_time - start_time
-                elapsed_minutes = elapsed.total_seconds() / 60
+    # Display timezone, resolved once rather than on every refresh
+    local_tz = _get_timezone(args.timezone)
+
+    # Reset time, month start and formatted reset for the current month, kept across refreshes
+    reset_cache = {}
+    # Database version, refresh time and recent alerts from the last data refresh
+    data_state = {}
+    # Predicted-end minute and its formatted string
+    end_cache = {}
+
+    def render_frame():
+        """Print one refresh of the monitor; returns seconds to wait before the next."""
+        # Get usage data
+        data = tracker.get_local_usage_data()
+        active_session = data['active_session']
+        recent_tokens = data['recent_tokens']
+
+        if not active_session:
+            if not args.demo:
+                print("No active session found. Creating new session...")
+                tracker.create_session()
+                return 0
             else:
-                elapsed_minutes = 0
-                current_time = datetime.now()
-
-            # Calculate burn rate from recent API calls
-            burn_rate = calculate_hourly_burn_rate(recent_calls, current_time)
-
-            # Update daily usage summary (every 10 minutes)
-            if int(elapsed_minutes) % 10 == 0:
+                print("No active session found in demo mode")
+                return 3
+
+        # Extract data from active session
+        tokens_used = active_session.total_tokens
+        total_cost = active_session.total_cost
+        model = active_session.model or "gpt-4"
+
+        usage_percentage = (tokens_used / token_limit) * 100 if token_limit > 0 else 0
+        tokens_left = token_limit - tokens_used
+
+        # Time calculations (one clock read per refresh)
+        now = datetime.now()
+        start_time_str = active_session.start_time
+        if start_time_str:
+            start_time = _parse_timestamp(start_time_str)
+            current_time = now
+            # Make both timezone-aware or both naive
+            if start_time.tzinfo is not None:
+                current_time = current_time.replace(tzinfo=timezone.utc)
+            elapsed = current_time - start_time
+            elapsed_minutes = elapsed.total_seconds() / 60
+        else:
+            elapsed_minutes = 0
+            current_time = now
+
+        # Calculate burn rate from recent API calls
+        burn_rate = calculate_hourly_burn_rate(recent_tokens, current_time) if recent_tokens else 0.0
+
+        # The summary, alert checks and alert list only need refreshing when
+        # something was written; otherwise this refresh just redraws
+        version = tracker.data_version()
+        if (version != data_state.get('version')
+                or time.monotonic() - data_state['fetched'] >= DATA_REFRESH_SECONDS):
+            # Update daily usage summary (every 10 minutes, once per matching minute)
+            session_minute = int(elapsed_minutes)
+            if session_minute % 10 == 0 and data_state.get('daily_minute') != session_minute:
                 tracker.update_daily_usage()
+                data_state['daily_minute'] = session_minute
 
             # Check for alerts
             usage_data = {
@@ -1371,118 +2095,143 @@ def main():
             }
             tracker.check_and_create_alerts(usage_data)
 
-            # Reset time calculation (monthly for OpenAI)
-            # Ensure current_time is timezone-aware for reset calculation
-            if current_time.tzinfo is None:
-                current_time = current_time.replace(tzinfo=timezone.utc)
-            reset_time = get_next_reset_time(current_time, None, args.timezone)
+            # Alert times are formatted here, once per data refresh
+            alerts = [(message, _parse_timestamp(triggered_at).strftime("%H:%M"))
+                      for _, message, triggered_at in tracker.get_recent_alerts()]
+            data_state.update(version=tracker.data_version(), fetched=time.monotonic(),
+                              alerts=alerts)
+
+        # Reset time calculation (monthly for OpenAI)
+        # Ensure current_time is timezone-aware for reset calculation
+        if current_time.tzinfo is None:
+            current_time = current_time.replace(tzinfo=timezone.utc)
+        # The reset instant and month start only change once a month
+        month_key = (current_time.year, current_time.month)
+        if reset_cache.get('month') != month_key or current_time >= reset_cache['reset_time']:
+            cached_reset = get_next_reset_time(current_time, None, args.timezone)
+            cached_month_start = current_time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            reset_cache.update(
+                month=month_key,
+                reset_time=cached_reset,
+                month_start=cached_month_start,
+                month_total=(cached_reset - cached_month_start).total_seconds() / 60,  # minutes
+                reset_time_str=cached_reset.astimezone(local_tz).strftime("%Y-%m-%d %H:%M"),
+            )
+        reset_time = reset_cache['reset_time']
 
-            # Calculate time to reset
-            time_to_reset = reset_time - current_time
-            minutes_to_reset = time_to_reset.total_seconds() / 60
-            days_to_reset = time_to_reset.days
+        # Calculate time to reset
+        time_to_reset = reset_time - current_time
+        minutes_to_reset = time_to_reset.total_seconds() / 60
+        days_to_reset = time_to_reset.days
 
-            # Predicted end calculation
-            if burn_rate > 0 and tokens_left > 0:
-                minutes_to_depletion = tokens_left / burn_rate
-                predicted_end_time = current_time + timedelta(minutes=minutes_to_depletion)
-            else:
-                predicted_end_time = reset_time
-
-            # Color codes
-            cyan = '\033[96m'
-            green = '\033[92m'
-            blue = '\033[94m'
-            red = '\033[91m'
-            yellow = '\033[93m'
-            white = '\033[97m'
-            gray = '\033[90m'
-            reset = '\033[0m'
-
-            # Display header
-            print_header()
-
-            # Token Usage section
-            print(f"📊 {white}Token Usage:{reset}    {create_token_progress_bar(usage_percentage)}")
-            print()
+        # Predicted end calculation
+        if burn_rate > 0 and tokens_left > 0:
+            minutes_to_depletion = tokens_left / burn_rate
+            predicted_end_time = current_time + timedelta(minutes=minutes_to_depletion)
+        else:
+            predicted_end_time = reset_time
 
-            # Time to Reset section (monthly progress)
-            month_start = current_time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            month_elapsed = (current_time - month_start).total_seconds() / 60  # minutes
-            month_total = (reset_time - month_start).total_seconds() / 60  # minutes
-            print(f"⏳ {white}Time to Reset:{reset}  {create_time_progress_bar(month_elapsed, month_total)}")
-            print()
+        # Display header
+        print_header()
 
-            # Detailed stats
-            print(f"🎯 {white}Tokens:{reset}         {white}{tokens_used:,}{reset} / {gray}{token_limit:,}{reset} ({cyan}{tokens_left:,} left{reset})")
-            print(f"💰 {white}Cost:{reset}           ${white}{total_cost:.4f}{reset}")
-            print(f"🤖 {white}Model:{reset}          {yellow}{model}{reset}")
-            print(f"🔥 {white}Burn Rate:{reset}      {yellow}{burn_rate:.1f}{reset} {gray}tokens/min{reset}")
-            print()
+        # Token Usage section
+        print(f"📊 {_WHITE}Token Usage:{_RESET}    {create_token_progress_bar(usage_percentage)}")
+        print()
 
-            # Predictions - convert to configured timezone for display
-            try:
-                local_tz = pytz.timezone(args.timezone)
-            except:
-                local_tz = pytz.timezone('UTC')
-            predicted_end_local = predicted_end_time.astimezone(local_tz)
-            reset_time_local = reset_time.astimezone(local_tz)
-
-            predicted_end_str = predicted_end_local.strftime("%Y-%m-%d %H:%M")
-            reset_time_str = reset_time_local.strftime("%Y-%m-%d %H:%M")
-            print(f"🏁 {white}Predicted End:{reset} {predicted_end_str}")
-            print(f"🔄 {white}Monthly Reset:{reset} {reset_time_str} ({days_to_reset} days)")
+        # Time to Reset section (monthly progress)
+        month_elapsed = (current_time - reset_cache['month_start']).total_seconds() / 60  # minutes
+        month_total = reset_cache['month_total']
+        print(f"⏳ {_WHITE}Time to Reset:{_RESET}  {create_time_progress_bar(month_elapsed, month_total)}")
+        print()
+
+        # Detailed stats
+        print(f"🎯 {_WHITE}Tokens:{_RESET}         {_WHITE}{tokens_used:,}{_RESET} / {_GRAY}{token_limit:,}{_RESET} ({_CYAN}{tokens_left:,} left{_RESET})")
+        print(f"💰 {_WHITE}Cost:{_RESET}           ${_WHITE}{total_cost:.4f}{_RESET}")
+        print(f"🤖 {_WHITE}Model:{_RESET}          {_YELLOW}{model}{_RESET}")
+        print(f"🔥 {_WHITE}Burn Rate:{_RESET}      {_YELLOW}{burn_rate:.1f}{_RESET} {_GRAY}tokens/min{_RESET}")
+        print()
+
+        # Predictions - convert to configured timezone for display; the string
+        # shows minutes, so it is only rebuilt when the predicted minute moves
+        predicted_minute = int(predicted_end_time.timestamp()) // 60
+        if end_cache.get('minute') != predicted_minute:
+            end_cache.update(minute=predicted_minute,
+                             text=predicted_end_time.astimezone(local_tz).strftime("%Y-%m-%d %H:%M"))
+        predicted_end_str = end_cache['text']
+        reset_time_str = reset_cache['reset_time_str']
+        print(f"🏁 {_WHITE}Predicted End:{_RESET} {predicted_end_str}")
+        print(f"🔄 {_WHITE}Monthly Reset:{_RESET} {reset_time_str} ({days_to_reset} days)")
+        print()
+
+        # Notifications
+        show_exceed_notification = tokens_used > token_limit
+
+        if show_exceed_notification:
+            print(f"🚨 {_RED}TOKENS EXCEEDED LIMIT! ({tokens_used:,} > {token_limit:,}){_RESET}")
             print()
 
-            # Notifications
-            show_exceed_notification = tokens_used > token_limit
+        # Warning if tokens will run out before reset
+        if predicted_end_time < reset_time and burn_rate > 0:
+            print(f"⚠️  {_RED}Tokens will run out BEFORE monthly reset!{_RESET}")
+            print()
 
-            if show_exceed_notification:
-                print(f"🚨 {red}TOKENS EXCEEDED LIMIT! ({tokens_used:,} > {token_limit:,}){reset}")
-                print()
+        # Show recent alerts (last 24 hours)
+        recent_alerts = data_state['alerts']
 
-            # Warning if tokens will run out before reset
-            if predicted_end_time < reset_time and burn_rate > 0:
-                print(f"⚠️  {red}Tokens will run out BEFORE monthly reset!{reset}")
-                print()
+        if recent_alerts:
+            for message, alert_time in recent_alerts:
+                print(f"🔔 {_YELLOW}{message}{_RESET} {_GRAY}({alert_time}){_RESET}")
+            print()
 
-            # Show recent alerts (last 24 hours)
-            conn = sqlite3.connect(args.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT alert_type, message, triggered_at FROM usage_alerts
-                WHERE triggered_at >= DATETIME('now', '-1 day') AND is_active = 1
-                ORDER BY triggered_at DESC LIMIT 3
-            ''')
-            recent_alerts = cursor.fetchall()
-            conn.close()
+        # Status line
+        current_time_str = now.strftime("%H:%M:%S")
+        status = "Demo Mode" if args.demo else "Live Monitoring"
+        print(f"⏰ {_GRAY}{current_time_str}{_RESET} 📝 {_CYAN}{status}...{_RESET} | {_GRAY}Ctrl+C to exit{_RESET} 🟨")
 
-            if recent_alerts:
-                for alert in recent_alerts:
-                    alert_time = datetime.fromisoformat(alert[2]).strftime("%H:%M")
-                    print(f"🔔 {yellow}{alert[1]}{reset} {gray}({alert_time}){reset}")
-                print()
+        return 3
 
-            # Status line
-            current_time_str = datetime.now().strftime("%H:%M:%S")
-            status = "Demo Mode" if args.demo else "Live Monitoring"
-            print(f"⏰ {gray}{current_time_str}{reset} 📝 {cyan}{status}...{reset} | {gray}Ctrl+C to exit{reset} 🟨")
+    try:
+        # A terminated monitor restores the cursor just like an interrupted one
+        signal.signal(signal.SIGTERM, _interrupt)
 
-            # Clear any remaining lines below to prevent artifacts
-            print('\033[J', end='', flush=True)
+        # Initial screen clear and hide cursor
+        sys.stdout.write(_CURSOR_HOME + _CLEAR_SCREEN + _HIDE_CURSOR)
+        sys.stdout.flush()
 
-            time.sleep(3)
+        # Refreshes follow a fixed grid on the monotonic clock, so the time
+        # spent rendering does not push every later refresh back
+        next_tick = time.monotonic()
+        shown_lines = []
+        while True:
+            # Build the whole frame off-screen and emit only the lines that
+            # changed since the previous one, in a single write
+            frame = io.StringIO()
+            with redirect_stdout(frame):
+                delay = render_frame()
+            lines = frame.getvalue().split('\n')
+            sys.stdout.write(_frame_update(shown_lines, lines))
+            sys.stdout.flush()
+            shown_lines = lines
+
+            next_tick += delay
+            remaining = next_tick - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+            else:
+                # Overran the slot (or asked for an immediate redraw); restart the grid here
+                next_tick = time.monotonic()
 
     except KeyboardInterrupt:
         # Show cursor before exiting
-        print('\033[?25h', end='', flush=True)
-        print(f"\n\n{cyan}Monitoring stopped.{reset}")
-        # Clear the terminal
-        os.system('clear' if os.name == 'posix' else 'cls')
+        print(_SHOW_CURSOR, end='', flush=True)
+        print(f"\n\n{_CYAN}Monitoring stopped.{_RESET}")
+        # Clear the terminal with the same escapes the display already relies on
+        sys.stdout.write(_CURSOR_HOME + _CLEAR_SCREEN)
+        sys.stdout.flush()
         sys.exit(0)
     except Exception as e:
         # Show cursor on any error
-        print('\033[?25h', end='', flush=True)
+        print(_SHOW_CURSOR, end='', flush=True)
         print(f"Error: {e}")
         raise
 